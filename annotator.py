@@ -0,0 +1,160 @@
+import argparse
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+import settings
+from detector import CATEGORIES, CategoryTable, FrameResult
+from preprocessing import FRAME_SIZE
+
+# Border colours of the sidebar categories in app.show_sidebar_results, as BGR
+CATEGORY_COLORS = {
+    "recyclable": (80, 175, 76),
+    "non_recyclable": (54, 67, 244),
+    "hazardous": (0, 152, 255),
+    "organic": (176, 39, 156),
+    "biodegradable": (212, 188, 0),
+}
+UNCATEGORISED_COLOR = (158, 158, 158)
+LABEL_MAX_FPS = getattr(settings, "LABEL_MAX_FPS", 10.0)
+ANNOTATE = getattr(settings, "ANNOTATE", True)
+
+
+class Annotator:
+    # Draws boxes coloured by waste category straight onto the frame (or onto a per-thread
+    # buffer reused between calls), instead of the full-size copy Results.plot() makes.
+    # With labels="auto", label text is dropped once drawing runs faster than label_max_fps.
+
+    def __init__(self, names, labels="auto", label_max_fps=LABEL_MAX_FPS, thickness=2, enabled=ANNOTATE):
+        self.table = CategoryTable(names)
+        self.labels = labels
+        self.label_max_fps = label_max_fps
+        self.thickness = thickness
+        self.enabled = enabled
+        self.colors = np.array([UNCATEGORISED_COLOR] * len(self.table.names), dtype=np.uint8).reshape(-1, 3)
+        # The first matching category (in sidebar order) decides the colour
+        for bit, category in reversed(list(enumerate(CATEGORIES))):
+            self.colors[(self.table.masks >> bit) & 1 == 1] = CATEGORY_COLORS[category]
+        self._local = threading.local()
+
+    def _draw_labels(self):
+        if self.labels != "auto":
+            return bool(self.labels)
+        # Tracked per thread so a fast video export does not strip labels from the webcam view
+        calls = getattr(self._local, "calls", None)
+        if calls is None:
+            calls = self._local.calls = deque(maxlen=16)
+        now = time.perf_counter()
+        calls.append(now)
+        if len(calls) < 2:
+            return True
+        rate = (len(calls) - 1) / max(now - calls[0], 1e-6)
+        return rate <= self.label_max_fps
+
+    def _buffer(self, frame):
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None or buffer.shape != frame.shape or buffer.dtype != frame.dtype:
+            buffer = self._local.buffer = np.empty_like(frame)
+        np.copyto(buffer, frame)
+        return buffer
+
+    def draw(self, frame, result, inplace=True):
+        # inplace=False returns a buffer that the next call on this thread overwrites; copy it to keep it
+        if not self.enabled or result is None:
+            return frame
+        canvas = frame if inplace else self._buffer(frame)
+        labels = self._draw_labels()
+        boxes = np.asarray(result.boxes, dtype=np.float32).reshape(-1, 4).astype(np.int32)
+        class_ids = np.asarray(result.class_ids, dtype=np.intp)
+        colors = self.colors[class_ids].tolist()
+        track_ids = result.track_ids.tolist() if result.track_ids is not None else [None] * len(class_ids)
+        for (x1, y1, x2, y2), color, class_id, track_id in zip(boxes.tolist(), colors, class_ids.tolist(),
+                                                                track_ids):
+            cv2.rectangle(canvas, (x1, y1), (x2, y2), color, self.thickness)
+            if labels:
+                label = self.table.names[class_id]
+                if track_id is not None:
+                    label = f"{label} #{track_id}"
+                cv2.putText(canvas, label, (x1, max(y1 - 4, 10)),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1, cv2.LINE_AA)
+        return canvas
+
+
+_annotators = {}
+_annotators_lock = threading.Lock()
+
+
+def get_annotator(names):
+    key = tuple(sorted(dict(enumerate(names) if isinstance(names, (list, tuple)) else names).items()))
+    with _annotators_lock:
+        annotator = _annotators.get(key)
+        if annotator is None:
+            annotator = _annotators[key] = Annotator(names)
+    return annotator
+
+
+def _random_result(names, boxes, shape, rng):
+    h, w = shape[:2]
+    xy = rng.uniform(0, [w - 40, h - 40], size=(boxes, 2))
+    wh = rng.uniform(10, 40, size=(boxes, 2))
+    class_ids = rng.integers(0, len(names), size=boxes)
+    return FrameResult(
+        boxes=np.hstack([xy, xy + wh]).astype(np.float32),
+        class_ids=class_ids,
+        class_names=np.array([names[i] for i in class_ids], dtype=object),
+        confidences=rng.uniform(0.4, 1.0, size=boxes).astype(np.float32),
+    )
+
+
+def benchmark(boxes=50, runs=200, shape=(FRAME_SIZE[1], FRAME_SIZE[0], 3)):
+    # Compares against ultralytics' Results.plot() on identical boxes
+    import torch
+    from ultralytics.engine.results import Results
+
+    names = {i: name for i, name in enumerate(
+        sorted(set(settings.RECYCLABLE) | set(settings.NON_RECYCLABLE) | set(settings.HAZARDOUS)
+               | set(settings.ORGANIC) | set(settings.BIODEGRADABLE))
+    )}
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, size=shape, dtype=np.uint8)
+    result = _random_result(names, boxes, shape, rng)
+    data = torch.tensor(np.hstack([
+        result.boxes, result.confidences[:, None], result.class_ids[:, None].astype(np.float32)
+    ]))
+    raw = Results(frame, path="", names=names, boxes=data)
+
+    def timed(fn):
+        fn()
+        start = time.perf_counter()
+        for _ in range(runs):
+            fn()
+        return (time.perf_counter() - start) * 1000 / runs
+
+    target = frame.copy()
+    labelled = Annotator(names, labels=True)
+    unlabelled = Annotator(names, labels=False)
+    rows = [
+        ("Results.plot()", timed(lambda: raw.plot())),
+        ("Annotator, labels, copy", timed(lambda: labelled.draw(frame, result, inplace=False))),
+        ("Annotator, no labels, copy", timed(lambda: unlabelled.draw(frame, result, inplace=False))),
+        ("Annotator, no labels, in place", timed(lambda: unlabelled.draw(target, result))),
+    ]
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the category annotator against Results.plot().")
+    parser.add_argument("--boxes", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    print(f"{'renderer':<32} {'ms / frame':>10}")
+    for name, ms in benchmark(args.boxes, args.runs):
+        print(f"{name:<32} {ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
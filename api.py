@@ -0,0 +1,104 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import cv2
+import numpy as np
+from fastapi import FastAPI, File, HTTPException, UploadFile
+
+import settings
+from jobs import get_job_manager
+from preprocessing import Preprocessor
+from scheduler import get_scheduler
+from tiling import TiledDetector
+
+scheduler = None
+prepare_image = Preprocessor(size=None)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global scheduler
+    # Images from concurrent requests are micro-batched into shared forward passes
+    scheduler = await asyncio.to_thread(get_scheduler)
+    # Picks up video jobs a previous run left unfinished
+    manager = await asyncio.to_thread(get_job_manager)
+    try:
+        yield
+    finally:
+        # Queued jobs are cancelled; they resume from their checkpoint on the next start
+        manager.shutdown()
+        await asyncio.to_thread(scheduler.stop)
+
+
+app = FastAPI(title="EcoDetect API", lifespan=lifespan)
+
+
+async def submit(image):
+    return await asyncio.wrap_future(scheduler.submit(image))
+
+
+def _decode(data):
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    return None if image is None else prepare_image(image)
+
+
+async def decode_upload(upload):
+    data = await upload.read()
+    # Decoding and preprocessing a full-resolution photo would otherwise stall the event loop
+    image = await asyncio.to_thread(_decode, data)
+    if image is None:
+        raise HTTPException(status_code=400, detail=f"Could not decode image {upload.filename!r}")
+    return image
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "model": str(settings.DETECTION_MODEL)}
+
+
+@app.get("/metrics")
+async def metrics():
+    return scheduler.metrics()
+
+
+@app.post("/detect")
+async def detect(file: UploadFile = File(...), tiled: bool = False):
+    image = await decode_upload(file)
+    if tiled:
+        # Tiles are submitted together and micro-batched by the scheduler like any other request
+        result = await asyncio.to_thread(TiledDetector(scheduler).detect, image)
+    else:
+        result = await submit(image)
+    return {"filename": file.filename, **result.to_dict()}
+
+
+@app.post("/detect/batch")
+async def detect_batch(files: list[UploadFile] = File(...)):
+    images = await asyncio.gather(*(decode_upload(f) for f in files))
+    results = await asyncio.gather(*(submit(image) for image in images))
+    return [{"filename": f.filename, **r.to_dict()} for f, r in zip(files, results)]
+
+
+@app.post("/jobs/video", status_code=202)
+async def submit_video(file: UploadFile = File(...)):
+    # Jobs run in worker processes and survive restarts; see jobs.py
+    job_id = await asyncio.to_thread(get_job_manager().submit, file.file, file.filename or "video.mp4")
+    return {"job_id": job_id}
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str, include_frames: bool = False, offset: int = 0, limit: int | None = None):
+    manager = get_job_manager()
+    job = manager.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    job.pop("video_path", None)
+    if include_frames:
+        job["frames"] = await asyncio.to_thread(manager.store.frames, job_id, offset, limit)
+    return job
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=getattr(settings, "API_HOST", "0.0.0.0"), port=getattr(settings, "API_PORT", 8000))
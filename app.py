@@ -1,9 +1,27 @@
 import streamlit as st
 import cv2
 import numpy as np
-from ultralytics import YOLO
 import settings
+import os
 import tempfile
+import time
+import uuid
+from scheduler import get_scheduler
+from sharding import analyse_sharded
+from detector import FrameResult
+from result_cache import get_cache
+from video_pipeline import AnnotatedVideoWriter, VideoPipeline, spooled_upload, video_info
+from sampling import make_sampler
+from annotator import get_annotator
+from camera import LatencyMeter
+from live import LIVE_REFRESH_SECONDS, get_live_detector
+from tracker import Tracker, format_unique_counts
+from smoothing import DetectionSmoother
+from sidebar import SidebarResults
+from tiling import TILE_OVERLAP, TILE_SIZE, TiledDetector
+from preprocessing import Preprocessor
+
+PREVIEW_FPS = getattr(settings, "PREVIEW_FPS", 2.0)
 
 
 def run_app():
@@ -24,90 +42,67 @@ def run_app():
                 st.session_state.page = "login"
         return
 
-    @st.cache_resource
-    def load_model(path):
-        return YOLO(str(path))
+    # Requests from all sessions are micro-batched onto the shared, pre-warmed model pool
+    engine = get_scheduler()
+    annotator = get_annotator(engine.names)
+    cache = get_cache()
+    # Uploaded photos get the same ROI/grayscale/denoise as video frames, at full resolution
+    prepare_image = Preprocessor(size=None)
 
-    model = load_model(settings.DETECTION_MODEL)
-
-    def classify_items(detected_items):
-        r = set(detected_items) & set(settings.RECYCLABLE)
-        nr = set(detected_items) & set(settings.NON_RECYCLABLE)
-        h = set(detected_items) & set(settings.HAZARDOUS)
-        o = set(detected_items) & set(settings.ORGANIC)
-        b = set(detected_items) & set(settings.BIODEGRADABLE)
-        return r, nr, h, o, b
+    # Fixed sidebar slots for this run; only categories whose items changed are re-sent
+    sidebar = SidebarResults()
 
     def show_sidebar_results(r, nr, h, o, b, all_detected):
-        if not all_detected:
-            st.sidebar.markdown("""
-                
-            """, unsafe_allow_html=True)
-            return
- 
-        # Sidebar header
-        st.sidebar.markdown("""
-            <div style="background: linear-gradient(135deg, #4CAF50 0%, #45a049 100%);
-                       color: white; padding: 1rem; border-radius: 10px; margin-bottom: 1rem;">
-                <h3 style="margin: 0; text-align: center;">🧾 Detection Results</h3>
-            </div>
-        """, unsafe_allow_html=True)
-
-        # Summary statistics
-        total_items = len(all_detected)
-        st.sidebar.markdown(f"""
-           
-        """, unsafe_allow_html=True)
-
-        # Categories with items
-        categories_data = [
-            (r, "♻️ Recyclable", "#e8f5e8", "#4CAF50"),
-            (nr, "🚫 Non-Recyclable", "#ffebee", "#f44336"),
-            (h, "☣️ Hazardous", "#fff3e0", "#ff9800"),
-            (o, "🍃 Organic", "#f3e5f5", "#9c27b0"),
-            (b, "🌱 Biodegradable", "#e0f2f1", "#00bcd4")
-        ]
-
-        for items, category_name, bg_color, border_color in categories_data:
-            if items:
-                st.sidebar.markdown(f"""
-                    <div style="background: {bg_color}; padding: 1rem; border-radius: 8px;
-                               border-left: 3px solid {border_color}; margin-bottom: 1rem;">
-                        <h4 style="color: {border_color}; margin: 0 0 0.5rem 0; font-size: 1rem;">
-                            {category_name} ({len(items)})
-                        </h4>
-                """, unsafe_allow_html=True)
-
-                for item in sorted(items):
-                    item_name = item.replace("_", " ").title()
-                    disposal = settings.DISPOSAL_METHODS.get(item, "No disposal info available.")
-
-                    st.sidebar.markdown(f"""
-                        <div style="background: white; padding: 0.7rem; border-radius: 6px;
-                                   margin-bottom: 0.4rem; box-shadow: 0 1px 3px rgba(0,0,0,0.1);">
-                            <strong style="color: #333; font-size: 0.9rem;">📦 {item_name}</strong><br>
-                            <span style="color: #666; font-size: 0.8rem;">
-                                🗑️ <em>{disposal}</em>
-                            </span>
-                        </div>
-                    """, unsafe_allow_html=True)
-
-                st.sidebar.markdown("</div>", unsafe_allow_html=True)
-
-     
-
-    def predict_and_display(image):
-        results = model.predict(image, conf=0.4)
-        detected = set(model.names[int(c)] for r in results for c in r.boxes.cls) if results else set()
-        r, nr, h, o, b = classify_items(detected)
-
-        if results:
-            annotated = results[0].plot()
-            st.image(annotated, channels="BGR", use_column_width=True)
+        sidebar.update(r, nr, h, o, b, all_detected)
+
+    def analyse_image(image, tiled=False):
+        # Identical pixels with the same model and threshold reuse the earlier result
+        key = cache.key(image, engine.conf, f"tiled:{TILE_SIZE}:{TILE_OVERLAP}" if tiled else "")
+        cached = cache.get(key)
+        if cached is None:
+            result = (TiledDetector(engine) if tiled else engine).detect(image)
+            cached = cache.put(key, annotator.draw(image, result), result)
+        return cached
+
+    def show_image_result(annotated, result):
+        st.image(annotated, channels="BGR", use_column_width=True)
+        show_sidebar_results(*result.buckets(), result.detected)
+
+    def show_job(job):
+        total = max(job["total_frames"] or 0, 1)
+        st.progress(min(job["processed"] / total, 1.0),
+                    text=f"{job['filename']}: {job['status']} · {job['processed']} of {job['total_frames']} frames")
+        if job["status"] == "failed":
+            st.error(f"Job failed: {job['error']}")
+        elif job["status"] == "done":
+            for category, items in job.get("summary", {}).items():
+                st.markdown(f"**{category.replace('_', ' ').title()}:** {', '.join(items)}")
+
+    @st.fragment(run_every=1.0)
+    def poll_job(manager, job_id):
+        from jobs import ACTIVE
+
+        job = manager.status(job_id)
+        if job is None or job["status"] not in ACTIVE:
+            # A full rerun swaps this polling fragment for the static view
+            st.rerun()
+        show_job(job)
+
+    def show_job_progress(job_id):
+        # Imported here so the job machinery only loads once someone uses background jobs
+        from jobs import ACTIVE, get_job_manager
+
+        manager = get_job_manager()
+        job = manager.status(job_id)
+        if job is None:
+            st.warning("No job with that id.")
+        elif job["status"] in ACTIVE:
+            poll_job(manager, job_id)
         else:
-            st.image(image, channels="BGR", use_column_width=True)
-
-        show_sidebar_results(r, nr, h, o, b, detected)
+            if job["status"] == "done" and "summary" not in job:
+                # Finished before summaries were stored in job.json
+                job = manager.store.update(job_id, summary=manager.store.summary(job_id))
+            show_job(job)
 
     # Session state
     if "webcam_on" not in st.session_state:
@@ -126,6 +121,17 @@ def run_app():
         st.session_state.detected_b = set()
     if "detected_all" not in st.session_state:
         st.session_state.detected_all = set()
+    # Analysis results per upload, so reruns from unrelated widgets only re-render
+    if "image_result" not in st.session_state:
+        st.session_state.image_result = None
+    if "video_result" not in st.session_state:
+        st.session_state.video_result = None
+    if "video_progress" not in st.session_state:
+        st.session_state.video_progress = None
+    if "skipped_inferences" not in st.session_state:
+        st.session_state.skipped_inferences = 0
+    if "video_job" not in st.session_state:
+        st.session_state.video_job = None
 
     # Show initial sidebar state
     show_sidebar_results(
@@ -176,6 +182,7 @@ def run_app():
             st.success("Logged out successfully!")
 
     st.markdown("</div>", unsafe_allow_html=True)
+    st.caption(f"⚙️ {engine.summary()}")
 
     # Image Upload Section
     st.markdown("""
@@ -193,11 +200,22 @@ def run_app():
         type=["jpg", "jpeg", "png"],
         help="Upload a clear image containing waste items for best results"
     )
+    tiled_image = st.checkbox(
+        "Tiled analysis for high-resolution photos",
+        help=f"Analyse overlapping {TILE_SIZE} px tiles so small items in large photos are not lost to downscaling"
+    )
 
     if uploaded_img:
-        file_bytes = np.asarray(bytearray(uploaded_img.read()), dtype=np.uint8)
-        img = cv2.imdecode(file_bytes, 1)
-        predict_and_display(img)
+        saved = st.session_state.image_result
+        if saved is not None and saved["file_id"] == uploaded_img.file_id and saved["tiled"] == tiled_image:
+            st.session_state.skipped_inferences += 1
+        else:
+            file_bytes = np.asarray(bytearray(uploaded_img.read()), dtype=np.uint8)
+            img = prepare_image(cv2.imdecode(file_bytes, 1))
+            annotated, result = analyse_image(img, tiled_image)
+            saved = {"file_id": uploaded_img.file_id, "tiled": tiled_image, "annotated": annotated, "result": result}
+            st.session_state.image_result = saved
+        show_image_result(saved["annotated"], saved["result"])
 
 
         # Video Upload Section
@@ -217,37 +235,237 @@ def run_app():
         help="Upload a video for waste detection"
     )
 
-    if uploaded_video is not None:
-        tfile = tempfile.NamedTemporaryFile(delete=False)
-        tfile.write(uploaded_video.read())
-        video_path = tfile.name
-
-        cap = cv2.VideoCapture(video_path)
-        frame_area = st.empty()
-        progress = st.progress(0)
-
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        current_frame = 0
-
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            frame = cv2.resize(frame, (640, int(640 * 9 / 16)))
-            results = model.predict(frame, conf=0.4)
-            detected = set(model.names[int(c)] for r in results for c in r.boxes.cls) if results else set()
-            r, nr, h, o, b = classify_items(detected)
-            annotated = results[0].plot() if results else frame
-
-            frame_area.image(annotated, channels="BGR")
-            show_sidebar_results(r, nr, h, o, b, detected)
+    sampling_labels = {
+        "Every frame": "every_frame",
+        "Fixed stride": "stride",
+        "Target analysis FPS": "target_fps",
+        "Scene change": "scene_change",
+    }
+    sampling_mode = sampling_labels[st.selectbox(
+        "Frame sampling",
+        list(sampling_labels),
+        help="Skipped frames reuse the detections of the last analysed frame"
+    )]
+    stride, target_fps, threshold = 5, 2.0, 0.04
+    if sampling_mode == "stride":
+        stride = st.number_input("Analyse every Nth frame", min_value=1, max_value=300, value=5)
+    elif sampling_mode == "target_fps":
+        target_fps = st.number_input("Analysis frames per second", min_value=0.1, max_value=60.0, value=2.0)
+    elif sampling_mode == "scene_change":
+        threshold = st.slider("Scene change sensitivity", min_value=0.01, max_value=0.30, value=0.04,
+                              help="Mean pixel difference needed before the model is run again")
+    run_in_background = st.checkbox(
+        "Run as background job",
+        help="Analysis continues if this tab closes; progress is saved and resumed after a restart"
+    )
+    split_video = st.checkbox(
+        "Split across CPU cores",
+        help="Analyse frame ranges of a long video in parallel worker processes, each with its own model"
+    )
+    export_video = st.checkbox(
+        "Export annotated video",
+        help=f"Encode every annotated frame to an MP4 for download; the preview refreshes "
+             f"{PREVIEW_FPS:g} times per second"
+    )
+    track_items = st.checkbox(
+        "Track and count unique items",
+        help="Follow each item from frame to frame so it is counted once; frames skipped by the "
+             "sampler move tracked boxes along their last motion"
+    )
 
-            current_frame += 1
-            progress.progress(min(current_frame / total_frames, 1.0))
+    video_key = (
+        uploaded_video.file_id if uploaded_video is not None else None,
+        sampling_mode, stride, target_fps, threshold, track_items, split_video, export_video,
+    )
 
-        cap.release()
-        st.success("✅ Video analysis complete!")
+    def discard_video_result():
+        # The exported MP4 lives in the temp folder until the result it belongs to is replaced
+        saved = st.session_state.video_result
+        if saved is not None and saved.get("export_path") and os.path.exists(saved["export_path"]):
+            os.remove(saved["export_path"])
+        st.session_state.video_result = None
+
+    def new_export_path():
+        return os.path.join(tempfile.gettempdir(), f"ecodetect-annotated-{uuid.uuid4().hex}.mp4")
+
+    saved_video = st.session_state.video_result
+    if saved_video is not None and saved_video["key"] != video_key:
+        # Settings changed or the upload was cleared
+        discard_video_result()
+        saved_video = None
+    if saved_video is not None:
+        if st.button("🔁 Re-analyse video", key="reanalyse_video"):
+            discard_video_result()
+            saved_video = None
+
+    if saved_video is not None:
+        st.session_state.skipped_inferences += saved_video["stats"]["inferred"]
+        if saved_video["annotated"] is not None:
+            st.image(saved_video["annotated"], channels="BGR")
+        show_sidebar_results(*saved_video["result"].buckets(), saved_video["result"].detected)
+        st.success(f"✅ Video analysis complete! Model ran on {saved_video['stats']['inferred']} "
+                   f"of {saved_video['stats']['frames']} frames.")
+        if saved_video.get("unique"):
+            unique_lines = format_unique_counts(*saved_video["unique"])
+            st.markdown("**Unique items:** " + (" · ".join(unique_lines) or "none"))
+        export_path = saved_video.get("export_path")
+        if export_path and os.path.exists(export_path):
+            with open(export_path, "rb") as f:
+                st.download_button("⬇️ Download annotated video", f, file_name="annotated.mp4",
+                                   mime="video/mp4", key="download_annotated")
+
+    elif uploaded_video is not None and run_in_background:
+        if st.session_state.video_job is None or st.session_state.video_job["key"] != video_key:
+            from jobs import get_job_manager
+
+            sampling = {"mode": sampling_mode, "stride": stride, "target_fps": target_fps, "threshold": threshold}
+            job_id = get_job_manager().submit(uploaded_video, uploaded_video.name, sampling)
+            st.session_state.video_job = {"key": video_key, "job_id": job_id}
+
+    elif uploaded_video is not None and split_video:
+        progress = st.progress(0.0, text="Splitting video across worker processes...")
+
+        def segment_done(done, total, segment):
+            progress.progress(done / total, text=f"{done} of {total} segments analysed")
+
+        sampling = {"mode": sampling_mode, "stride": stride, "target_fps": target_fps, "threshold": threshold}
+        export_path = new_export_path() if export_video else None
+        try:
+            with spooled_upload(uploaded_video) as video_path:
+                frames, stats = analyse_sharded(video_path, sampling=sampling, output_path=export_path,
+                                                on_segment=segment_done)
+        except BaseException:
+            if export_path and os.path.exists(export_path):
+                os.remove(export_path)
+            raise
+
+        # Everything seen anywhere in the video, in the same shape as a single-frame result
+        categories = {}
+        for frame in frames:
+            for category, items in frame["categories"].items():
+                categories.setdefault(category, set()).update(items)
+        summary = FrameResult(
+            class_names=np.array(sorted(set().union(*categories.values())), dtype=object),
+            categories=categories,
+        )
+        show_sidebar_results(*summary.buckets(), summary.detected)
+        st.session_state.video_result = {
+            "key": video_key,
+            "annotated": None,
+            "result": summary,
+            "stats": stats,
+            "export_path": export_path,
+        }
+        st.success(f"✅ Video analysis complete! {stats['segments']} segments, model ran on "
+                   f"{stats['inferred']} of {stats['frames']} frames.")
+        if export_path:
+            with open(export_path, "rb") as f:
+                st.download_button("⬇️ Download annotated video", f, file_name="annotated.mp4",
+                                   mime="video/mp4", key="download_annotated")
+
+    elif uploaded_video is not None:
+        # Spooled to disk in chunks; the temporary file is removed even if analysis fails
+        with spooled_upload(uploaded_video) as video_path:
+            frame_area = st.empty()
+            progress = st.progress(0)
+
+            total_frames, source_fps = video_info(video_path)
+            total_frames = max(total_frames, 1)
+
+            # A rerun (any widget change) interrupts the loop below. The pipeline, tracker and
+            # smoother are kept with the next frame index, so the same upload picks up where it
+            # stopped. An export cannot be appended to, so it always starts from the first frame.
+            resume = st.session_state.video_progress
+            if resume is None or resume["key"] != video_key or export_video:
+                sampler = make_sampler(sampling_mode, stride=stride, source_fps=source_fps,
+                                       target_fps=target_fps, threshold=threshold)
+                resume = st.session_state.video_progress = {
+                    "key": video_key,
+                    "next": 0,
+                    "pipeline": VideoPipeline(engine, sampler=sampler),
+                    "tracker": Tracker(engine.names) if track_items else None,
+                    "smoother": DetectionSmoother(engine.names),
+                }
+            pipeline, tracker, smoother = resume["pipeline"], resume["tracker"], resume["smoother"]
+            start = resume["next"]
+            if start:
+                show_sidebar_results(*smoother.result.buckets(), smoother.result.detected)
+
+            writer = None
+            if export_video:
+                writer = AnnotatedVideoWriter(new_export_path(), source_fps, annotate=annotator.draw)
+
+            # Decoding and inference run on background threads; only rendering happens here.
+            # When exporting, every frame goes to the encoder and the browser gets a throttled preview.
+            annotated, frame, result, shown = None, None, None, None
+            last_preview = 0.0
+            completed = False
+            try:
+                for index, frame, result in pipeline.run(video_path, start=start):
+                    # Tracked boxes carry ids and keep moving on frames the sampler skipped
+                    shown = tracker.step(result) if tracker is not None else result
+                    # The sidebar is redrawn only when the smoothed set of classes changes
+                    smoothed, changed = smoother.update(result)
+                    if changed:
+                        show_sidebar_results(*smoothed.buckets(), smoothed.detected)
+                    resume["next"] = index + 1
+                    if writer is not None:
+                        writer.write(frame, shown)
+                        if time.perf_counter() - last_preview < 1 / PREVIEW_FPS:
+                            continue
+                        last_preview = time.perf_counter()
+                        # The encoder thread draws on this frame too, so preview from a private buffer
+                        annotated = annotator.draw(frame, shown, inplace=False)
+                    else:
+                        annotated = annotator.draw(frame, shown)
+
+                    frame_area.image(annotated, channels="BGR")
+                    progress.progress(min((index + 1) / total_frames, 1.0))
+                completed = result is not None
+            except Exception:
+                # Only an interrupted run resumes; a failed one starts over
+                st.session_state.video_progress = None
+                raise
+            finally:
+                export_path = writer.close() if writer is not None else None
+                # A failed or empty analysis has no result to keep its export alive
+                if export_path and not completed:
+                    if os.path.exists(export_path):
+                        os.remove(export_path)
+                    export_path = None
+            st.session_state.video_progress = None
+
+            unique = tracker.unique_counts() if tracker is not None else None
+            if result is not None:
+                annotated = annotator.draw(frame.copy(), shown)
+                frame_area.image(annotated, channels="BGR")
+                progress.progress(1.0)
+                st.session_state.video_result = {
+                    "key": video_key,
+                    "annotated": annotated,
+                    "result": smoother.result,
+                    "stats": dict(pipeline.stats),
+                    "export_path": export_path,
+                    "unique": unique,
+                }
+            st.success(f"✅ Video analysis complete! Model ran on {pipeline.stats['inferred']} "
+                       f"of {pipeline.stats['frames']} frames.")
+            if unique:
+                unique_lines = format_unique_counts(*unique)
+                st.markdown("**Unique items:** " + (" · ".join(unique_lines) or "none"))
+            if export_path:
+                with open(export_path, "rb") as f:
+                    st.download_button("⬇️ Download annotated video", f, file_name="annotated.mp4",
+                                       mime="video/mp4", key="download_annotated")
+
+    with st.expander("🗂️ Background video jobs", expanded=st.session_state.video_job is not None):
+        lookup = st.text_input("Job id", value=(st.session_state.video_job or {}).get("job_id", ""),
+                               help="Paste a job id to check on a job started earlier")
+        if lookup:
+            show_job_progress(lookup.strip())
+
+    if st.session_state.skipped_inferences:
+        st.caption(f"♻️ {st.session_state.skipped_inferences} inferences skipped by reusing earlier results")
 
 
 
@@ -285,14 +503,23 @@ def run_app():
 
     frame_area = st.empty()
 
+    # Capture and inference run in a shared background worker; this session only polls it
+    live = get_live_detector(settings.WEBCAM_PATH, engine, annotate=annotator.draw)
+    if "viewer_id" not in st.session_state:
+        st.session_state.viewer_id = uuid.uuid4().hex
+    if "live_latency" not in st.session_state:
+        st.session_state.live_latency = LatencyMeter()
+
     if start:
         st.session_state.webcam_on = True
 
     if stop:
         st.session_state.webcam_on = False
+        live.detach(st.session_state.viewer_id)
 
     if cancel:
         st.session_state.webcam_on = False
+        live.detach(st.session_state.viewer_id)
         st.session_state.last_frame = None
         st.session_state.detected_r.clear()
         st.session_state.detected_nr.clear()
@@ -303,31 +530,57 @@ def run_app():
 
 
     if st.session_state.webcam_on:
-        cap = cv2.VideoCapture(settings.WEBCAM_PATH)
-        while st.session_state.webcam_on:
-            ret, frame = cap.read()
-            if not ret:
-                st.warning("Could not access webcam.")
-                break
-            frame = cv2.resize(frame, (640, int(640 * 9 / 16)))
-            results = model.predict(frame, conf=0.4)
-            detected = set(model.names[int(c)] for r in results for c in r.boxes.cls) if results else set()
-            r, nr, h, o, b = classify_items(detected)
-
-            annotated = results[0].plot() if results else frame
-            frame_area.image(annotated, channels="BGR")
-
-            st.session_state.last_frame = annotated
-            st.session_state.detected_r = r
-            st.session_state.detected_nr = nr
-            st.session_state.detected_h = h
-            st.session_state.detected_o = o
-            st.session_state.detected_b = b
-            st.session_state.detected_all = detected
-
-            show_sidebar_results(r, nr, h, o, b, detected)
-
-        cap.release()
+        live.attach(st.session_state.viewer_id)
+        show_sidebar_results(
+            st.session_state.detected_r,
+            st.session_state.detected_nr,
+            st.session_state.detected_h,
+            st.session_state.detected_o,
+            st.session_state.detected_b,
+            st.session_state.detected_all,
+        )
+
+        @st.fragment(run_every=LIVE_REFRESH_SECONDS)
+        def live_feed():
+            snapshot = live.snapshot(st.session_state.viewer_id)
+            if live.error:
+                st.warning(live.error)
+                return
+            if snapshot is None:
+                st.info("📷 Starting camera...")
+                return
+
+            st.image(snapshot.annotated, channels="BGR")
+            st.session_state.last_frame = snapshot.annotated
+            r, nr, h, o, b = snapshot.smoothed.buckets()
+            detected = snapshot.smoothed.detected
+
+            # Fragments cannot draw into the sidebar, so a full rerun redraws it, but only when
+            # the smoothed set of classes changed rather than on every frame
+            if detected != st.session_state.detected_all:
+                st.session_state.detected_r = r
+                st.session_state.detected_nr = nr
+                st.session_state.detected_h = h
+                st.session_state.detected_o = o
+                st.session_state.detected_b = b
+                st.session_state.detected_all = detected
+                st.rerun()
+
+            labels = [("♻️", r), ("🚫", nr), ("☣️", h), ("🍃", o), ("🌱", b)]
+            summary = " · ".join(
+                f"{icon} {', '.join(sorted(items))}" for icon, items in labels if items
+            )
+            st.markdown(summary or "No waste items detected")
+            if snapshot.unique:
+                unique_lines = format_unique_counts(*snapshot.unique)
+                st.caption("🔢 Unique items this session: " + (" · ".join(unique_lines) or "none"))
+
+            latency = st.session_state.live_latency
+            latency.record(snapshot.captured_at)
+            st.caption(f"⏱️ Capture-to-display latency: {latency.average_ms:.0f} ms · "
+                       f"stale frames dropped: {snapshot.dropped}")
+
+        live_feed()
 
     elif st.session_state.last_frame is not None:
         frame_area.image(st.session_state.last_frame, channels="BGR")
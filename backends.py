@@ -0,0 +1,105 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from ultralytics import YOLO
+
+import settings
+from preprocessing import FRAME_SIZE, INPUT_SIZE
+
+# Every backend is driven through ultralytics' YOLO wrapper, so predictions come back as the
+# same Results objects regardless of runtime and the category mapping keeps working unchanged.
+BACKENDS = ("pytorch", "onnx", "onnx_int8", "openvino")
+INFERENCE_BACKEND = getattr(settings, "INFERENCE_BACKEND", "pytorch")
+EXPORT_IMGSZ = getattr(settings, "EXPORT_IMGSZ", 640)
+
+
+def exported_path(weights, backend):
+    weights = Path(weights)
+    if backend == "onnx":
+        return weights.with_suffix(".onnx")
+    if backend == "onnx_int8":
+        return weights.with_name(f"{weights.stem}_int8.onnx")
+    if backend == "openvino":
+        return weights.parent / f"{weights.stem}_openvino_model"
+    return weights
+
+
+def move_into_place(built, target):
+    # Exports are staged next to the target and renamed in, so a process loading the model never
+    # sees a half-written file. When several workers export at once the first rename wins; the
+    # others find the target already there and drop their identical copy.
+    try:
+        os.replace(built, target)
+    except OSError:
+        if not Path(target).exists():
+            raise
+    return Path(target)
+
+
+def export_model(weights=None, backend="onnx", imgsz=EXPORT_IMGSZ, force=False):
+    weights = Path(weights or settings.DETECTION_MODEL)
+    target = exported_path(weights, backend)
+    if backend == "pytorch" or (target.exists() and not force):
+        return target
+    if backend == "onnx_int8":
+        from quantization import quantize_model
+
+        return quantize_model(weights, imgsz=imgsz, force=force)
+    with tempfile.TemporaryDirectory(dir=weights.parent, prefix=".export-") as staging:
+        staged = Path(staging) / weights.name
+        shutil.copy2(weights, staged)
+        # dynamic axes let the exported graph accept the engine's variable batch sizes
+        built = YOLO(str(staged)).export(format=backend, imgsz=imgsz, dynamic=True)
+        if force and target.is_dir():
+            # A directory (OpenVINO) cannot be replaced by a rename
+            shutil.rmtree(target, ignore_errors=True)
+        return move_into_place(built, target)
+
+
+def load_backend_model(weights=None, backend=None):
+    backend = backend or INFERENCE_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend} (expected one of {', '.join(BACKENDS)})")
+    weights = weights or settings.DETECTION_MODEL
+    if backend == "pytorch":
+        return YOLO(str(weights))
+    return YOLO(str(export_model(weights, backend)), task="detect")
+
+
+def time_backend(backend, weights=None, runs=20, shape=(FRAME_SIZE[1], FRAME_SIZE[0], 3)):
+    # Frames shaped and sized as the app runs them
+    model = load_backend_model(weights, backend)
+    frame = np.random.randint(0, 255, shape, dtype=np.uint8)
+    model.predict(frame, imgsz=INPUT_SIZE, verbose=False)
+    start = time.perf_counter()
+    for _ in range(runs):
+        model.predict(frame, imgsz=INPUT_SIZE, verbose=False)
+    return (time.perf_counter() - start) * 1000 / runs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the detection model and compare CPU backends.")
+    parser.add_argument("--weights", default=None)
+    # onnx_int8 needs calibration images, so it is only benchmarked when asked for
+    parser.add_argument("--backends", nargs="+", default=["pytorch", "onnx", "openvino"], choices=BACKENDS)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--export-only", action="store_true")
+    args = parser.parse_args(argv)
+
+    for backend in args.backends:
+        print(f"{backend}: {export_model(args.weights, backend)}")
+    if args.export_only:
+        return
+
+    print(f"\n{'backend':<10} {'ms / frame':>10}")
+    for backend in args.backends:
+        print(f"{backend:<10} {time_backend(backend, args.weights, args.runs):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from preprocessing import FRAME_SIZE, Preprocessor
+
+
+class LatestFrameGrabber:
+    # Reads the camera on its own thread and keeps only the newest frame, so a slow
+    # consumer never sees frames that queued up in the driver while it was busy.
+
+    def __init__(self, source, size=FRAME_SIZE, pace=False, loop=False):
+        # pace and loop are for recorded files standing in for live cameras: pace reads at the
+        # file's own FPS instead of as fast as possible, loop restarts from the first frame
+        self.source = source
+        self.size = size
+        self.preprocess = Preprocessor(size) if size else None
+        self.pace = pace
+        self.loop = loop
+        self.captured = 0
+        self.consumed = 0
+        self.failed = False
+        self._cap = None
+        self._frame = None
+        self._captured_at = 0.0
+        self._seq = 0
+        self._last_read = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    @property
+    def dropped(self):
+        return max(self.captured - self.consumed, 0)
+
+    def start(self):
+        self._cap = cv2.VideoCapture(self.source)
+        self._cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="camera-grabber", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        fps = self._cap.get(cv2.CAP_PROP_FPS) if self.pace else 0
+        interval = 1.0 / fps if fps and fps > 0 else 0.0
+        next_at = time.perf_counter()
+        while self._running:
+            if interval:
+                next_at += interval
+                time.sleep(max(next_at - time.perf_counter(), 0.0))
+            ret, frame = self._cap.read()
+            captured_at = time.perf_counter()
+            if not ret and self.loop and self.captured:
+                self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = self._cap.read()
+            if not ret:
+                with self._cond:
+                    self.failed = True
+                    self._cond.notify_all()
+                return
+            if self.preprocess:
+                frame = self.preprocess(frame)
+            with self._cond:
+                self._frame = frame
+                self._captured_at = captured_at
+                self._seq += 1
+                self.captured += 1
+                self._cond.notify_all()
+
+    def read(self, timeout=2.0):
+        # Returns (frame, captured_at) for a frame newer than the last one read, or None
+        with self._cond:
+            ready = self._cond.wait_for(lambda: self._seq > self._last_read or self.failed, timeout)
+            if not ready or self._seq == self._last_read:
+                return None
+            self._last_read = self._seq
+            self.consumed += 1
+            return self._frame, self._captured_at
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        if self._cap is not None:
+            self._cap.release()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class LatencyMeter:
+    def __init__(self, window=30):
+        self.samples = deque(maxlen=window)
+
+    def record(self, captured_at):
+        self.samples.append((time.perf_counter() - captured_at) * 1000)
+
+    @property
+    def average_ms(self):
+        return sum(self.samples) / len(self.samples) if self.samples else 0.0
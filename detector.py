@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+import sys
+from dataclasses import dataclass, field
+from itertools import islice
+
+import cv2
+import numpy as np
+
+import settings
+from backends import BACKENDS, load_backend_model
+from preprocessing import INPUT_SIZE
+
+# Order matches the (r, nr, h, o, b) tuples used by the Streamlit sidebar
+CATEGORIES = ("recyclable", "non_recyclable", "hazardous", "organic", "biodegradable")
+
+DEFAULT_CONF = 0.4
+DEFAULT_BATCH_SIZE = getattr(settings, "BATCH_SIZE", 8)
+
+
+def category_members():
+    return {
+        "recyclable": set(settings.RECYCLABLE),
+        "non_recyclable": set(settings.NON_RECYCLABLE),
+        "hazardous": set(settings.HAZARDOUS),
+        "organic": set(settings.ORGANIC),
+        "biodegradable": set(settings.BIODEGRADABLE),
+    }
+
+
+def classify_items(detected_items):
+    detected = set(detected_items)
+    members = category_members()
+    return tuple(detected & members[name] for name in CATEGORIES)
+
+
+class CategoryTable:
+    # Built once per model: each class id maps to a bitmask with one bit per entry of CATEGORIES
+
+    def __init__(self, names):
+        names = dict(enumerate(names)) if isinstance(names, (list, tuple)) else dict(names)
+        size = max(names) + 1 if names else 0
+        self.names = np.array([names.get(i, str(i)) for i in range(size)], dtype=object)
+        self.masks = np.zeros(size, dtype=np.uint8)
+        self.bits = np.arange(len(CATEGORIES), dtype=np.uint8)
+        members = category_members()
+        for bit, category in enumerate(CATEGORIES):
+            in_category = np.array([name in members[category] for name in self.names], dtype=bool)
+            self.masks[in_category] |= np.uint8(1 << bit)
+
+    def classify(self, class_ids):
+        class_ids = np.asarray(class_ids, dtype=np.intp)
+        hits = (self.masks[class_ids][:, None] >> self.bits) & 1
+        counts = hits.sum(axis=0)
+        unique = np.unique(class_ids)
+        unique_hits = (self.masks[unique][:, None] >> self.bits) & 1
+        categories = {
+            category: set(self.names[unique[unique_hits[:, bit] == 1]])
+            for bit, category in enumerate(CATEGORIES)
+        }
+        return categories, {category: int(counts[bit]) for bit, category in enumerate(CATEGORIES)}
+
+
+def _empty(shape=(0,), dtype=np.float32):
+    return field(default_factory=lambda: np.zeros(shape, dtype=dtype))
+
+
+@dataclass
+class FrameResult:
+    boxes: np.ndarray = _empty((0, 4))
+    class_ids: np.ndarray = _empty(dtype=np.intp)
+    class_names: np.ndarray = _empty(dtype=object)
+    confidences: np.ndarray = _empty()
+    categories: dict = field(default_factory=lambda: {name: set() for name in CATEGORIES})
+    counts: dict = field(default_factory=lambda: dict.fromkeys(CATEGORIES, 0))
+    track_ids: np.ndarray = None
+    raw: object = None
+
+    @property
+    def detected(self):
+        return set(self.class_names)
+
+    def buckets(self):
+        return tuple(self.categories.get(name, set()) for name in CATEGORIES)
+
+    def plot(self, frame):
+        # Draws on the given frame so results carried forward to skipped frames line up
+        return self.raw.plot(img=frame) if self.raw is not None else frame
+
+    def to_dict(self):
+        detections = [
+            {"box": box, "class_id": cid, "class_name": name, "confidence": conf}
+            for box, cid, name, conf in zip(
+                np.asarray(self.boxes).tolist(),
+                np.asarray(self.class_ids).tolist(),
+                list(self.class_names),
+                np.asarray(self.confidences).tolist(),
+            )
+        ]
+        if self.track_ids is not None:
+            for detection, track_id in zip(detections, np.asarray(self.track_ids).tolist()):
+                detection["track_id"] = track_id
+        return {
+            "detections": detections,
+            "categories": {name: sorted(items) for name, items in self.categories.items()},
+            "counts": dict(self.counts),
+        }
+
+
+def load_model(path=None, backend=None):
+    return load_backend_model(path, backend)
+
+
+def batched(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class DetectionEngine:
+    def __init__(self, model=None, model_path=None, conf=DEFAULT_CONF, batch_size=DEFAULT_BATCH_SIZE, backend=None,
+                 imgsz=INPUT_SIZE):
+        self.model = model if model is not None else load_model(model_path, backend)
+        self.names = self.model.names
+        self.table = CategoryTable(self.names)
+        self.conf = conf
+        self.imgsz = imgsz
+        self.batch_size = max(1, int(batch_size))
+
+    def _to_result(self, raw):
+        boxes = raw.boxes.cpu().numpy()
+        class_ids = boxes.cls.astype(np.intp)
+        categories, counts = self.table.classify(class_ids)
+        return FrameResult(
+            boxes=boxes.xyxy,
+            class_ids=class_ids,
+            class_names=self.table.names[class_ids],
+            confidences=boxes.conf,
+            categories=categories,
+            counts=counts,
+            raw=raw,
+        )
+
+    def predict(self, frames, conf=None):
+        # One forward pass over the whole list of frames
+        frames = list(frames)
+        if not frames:
+            return []
+        results = self.model.predict(frames, conf=self.conf if conf is None else conf, imgsz=self.imgsz,
+                                     verbose=False)
+        return [self._to_result(raw) for raw in results]
+
+    def predict_batches(self, frames, batch_size=None, conf=None):
+        # Lazily consumes any iterator of frames, yielding one result per frame
+        for chunk in batched(frames, batch_size or self.batch_size):
+            yield from self.predict(chunk, conf=conf)
+
+    def detect(self, frame, conf=None):
+        return self.predict([frame], conf=conf)[0]
+
+
+_process_engine = None
+
+
+def process_engine(workers=1):
+    # One engine per process, for worker processes that must not share the parent's models.
+    # workers is how many such processes share the machine: each gets an equal share of the
+    # cores instead of every model starting one thread per core.
+    global _process_engine
+    if _process_engine is None:
+        import torch
+
+        threads = max(1, (os.cpu_count() or 1) // max(1, workers))
+        torch.set_num_threads(threads)
+        cv2.setNumThreads(threads)
+        _process_engine = DetectionEngine()
+    return _process_engine
+
+
+def iter_image_files(folder, extensions=(".jpg", ".jpeg", ".png")):
+    for name in sorted(os.listdir(folder)):
+        if name.lower().endswith(extensions):
+            yield os.path.join(folder, name)
+
+
+def read_images(paths):
+    # (path, image) pairs; corrupt or unreadable files are reported and skipped
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            print(f"Skipping unreadable image: {path}", file=sys.stderr)
+            continue
+        yield path, image
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run waste detection over a folder of images.")
+    parser.add_argument("folder")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--conf", type=float, default=DEFAULT_CONF)
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--backend", default=None, choices=BACKENDS)
+    args = parser.parse_args(argv)
+
+    engine = DetectionEngine(
+        model_path=args.model, conf=args.conf, batch_size=args.batch_size, backend=args.backend
+    )
+    # Paths travel with their images so a skipped file cannot shift later results
+    for chunk in batched(read_images(iter_image_files(args.folder)), engine.batch_size):
+        results = engine.predict([image for _, image in chunk])
+        for (path, _), result in zip(chunk, results):
+            print(json.dumps({"image": path, **result.to_dict()}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import settings
+from video_pipeline import CHUNK_SIZE, VideoPipeline, video_info
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = getattr(settings, "JOBS_DIR", "jobs")
+JOB_WORKERS = getattr(settings, "JOB_WORKERS", 2)
+CHECKPOINT_EVERY = getattr(settings, "JOB_CHECKPOINT_EVERY", 25)
+
+ACTIVE = ("queued", "running")
+
+
+class JobStore:
+    # Each job is a folder holding the video, job.json with its status and frames.jsonl with
+    # one line per analysed frame. frames.jsonl doubles as the checkpoint: a resumed job
+    # continues from the number of complete lines in it.
+
+    def __init__(self, root=JOBS_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def job_dir(self, job_id):
+        return os.path.join(self.root, job_id)
+
+    def _meta_path(self, job_id):
+        return os.path.join(self.job_dir(job_id), "job.json")
+
+    def frames_path(self, job_id):
+        return os.path.join(self.job_dir(job_id), "frames.jsonl")
+
+    def lock(self, job_id):
+        # The app and the API share JOBS_DIR; whoever holds this lock owns the job. The OS drops
+        # it when the owning process exits, so a crashed owner never blocks a resume.
+        f = open(os.path.join(self.job_dir(job_id), "job.lock"), "a")
+        try:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.close()
+            return None
+        return f
+
+    def owned(self, job_id):
+        lock = self.lock(job_id)
+        if lock is None:
+            return True
+        lock.close()
+        return False
+
+    def create(self, source, filename="video.mp4", sampling=None):
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.job_dir(job_id))
+        video_path = os.path.join(self.job_dir(job_id), "video" + (os.path.splitext(filename)[1] or ".mp4"))
+        with open(video_path, "wb") as f:
+            if isinstance(source, (str, os.PathLike)):
+                with open(source, "rb") as src:
+                    shutil.copyfileobj(src, f, CHUNK_SIZE)
+            else:
+                if hasattr(source, "seek"):
+                    source.seek(0)
+                shutil.copyfileobj(source, f, CHUNK_SIZE)
+        open(self.frames_path(job_id), "w").close()
+        self.save(job_id, {
+            "job_id": job_id,
+            "filename": filename,
+            "video_path": video_path,
+            "sampling": sampling or {},
+            "status": "queued",
+            "processed": 0,
+            "total_frames": video_info(video_path)[0],
+            "error": None,
+            "created_at": time.time(),
+            "updated_at": time.time(),
+        })
+        return job_id
+
+    def load(self, job_id):
+        # Ids come from users (API path, Streamlit lookup), so never let them leave the jobs folder
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(self._meta_path(job_id)) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def save(self, job_id, meta):
+        # Written to a temporary file and renamed so a crash never leaves a half-written job.json
+        meta["updated_at"] = time.time()
+        path = self._meta_path(job_id)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, path)
+
+    def update(self, job_id, **changes):
+        meta = self.load(job_id)
+        meta.update(changes)
+        self.save(job_id, meta)
+        return meta
+
+    def checkpoint(self, job_id):
+        # Drops a trailing partial line left by an interrupted write and returns the frame count
+        path = self.frames_path(job_id)
+        with open(path, "rb") as f:
+            data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]
+        if len(complete) != len(data):
+            with open(path, "wb") as f:
+                f.write(complete)
+        return complete.count(b"\n")
+
+    def frames(self, job_id, offset=0, limit=None):
+        with open(self.frames_path(job_id)) as f:
+            lines = f.readlines()[offset:None if limit is None else offset + limit]
+        return [json.loads(line) for line in lines if line.endswith("\n")]
+
+    def summary(self, job_id):
+        # Every item seen anywhere in the video, per waste category
+        seen = {}
+        for frame in self.frames(job_id):
+            for category, items in frame["categories"].items():
+                seen.setdefault(category, set()).update(items)
+        return {category: sorted(items) for category, items in seen.items() if items}
+
+    def list(self):
+        jobs = (self.load(name) for name in sorted(os.listdir(self.root)))
+        return [job for job in jobs if job is not None]
+
+
+def process_job(root, job_id):
+    from detector import process_engine
+    from sampling import make_sampler
+
+    store = JobStore(root)
+    lock = store.lock(job_id)
+    if lock is None:
+        logger.info("Video job %s is already being processed elsewhere", job_id)
+        return
+    try:
+        start = store.checkpoint(job_id)
+        meta = store.update(job_id, status="running", processed=start, error=None, owner=os.getpid())
+        total, fps = video_info(meta["video_path"])
+        sampler = make_sampler(source_fps=fps, **meta["sampling"])
+        # One model per worker process, loaded on its first job
+        pipeline = VideoPipeline(process_engine(JOB_WORKERS), sampler=sampler)
+        processed = start
+        with open(store.frames_path(job_id), "a") as frames:
+            for index, _, result in pipeline.run(meta["video_path"], start=start):
+                frames.write(json.dumps({"frame": index, **result.to_dict()}) + "\n")
+                processed = index + 1
+                if processed % CHECKPOINT_EVERY == 0:
+                    frames.flush()
+                    os.fsync(frames.fileno())
+                    store.update(job_id, processed=processed)
+        # Summarised once here, so viewers of a finished job never read frames.jsonl again
+        store.update(job_id, status="done", processed=processed, total_frames=total,
+                     summary=store.summary(job_id))
+    except Exception as e:
+        logger.exception("Video job %s failed", job_id)
+        store.update(job_id, status="failed", error=str(e))
+        raise
+    finally:
+        lock.close()
+
+
+class JobManager:
+    def __init__(self, root=JOBS_DIR, workers=JOB_WORKERS):
+        self.store = JobStore(root)
+        # spawn, not fork: the parent already runs model and camera threads
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self._lock = threading.Lock()
+        self._futures = {}
+
+    def _schedule(self, job_id):
+        with self._lock:
+            future = self._futures.get(job_id)
+            if future is not None and not future.done():
+                return
+            self._futures[job_id] = self._executor.submit(process_job, self.store.root, job_id)
+
+    def submit(self, source, filename="video.mp4", sampling=None):
+        job_id = self.store.create(source, filename, sampling)
+        self._schedule(job_id)
+        return job_id
+
+    def resume_interrupted(self):
+        # Jobs left queued or running by a process that is gone continue from their checkpoint;
+        # jobs another live process is working on are left to it
+        resumed = []
+        for job in self.store.list():
+            if job["status"] in ACTIVE and not self.store.owned(job["job_id"]):
+                self._schedule(job["job_id"])
+                resumed.append(job["job_id"])
+        if resumed:
+            logger.info("Resuming %d interrupted video job(s)", len(resumed))
+        return resumed
+
+    def status(self, job_id):
+        return self.store.load(job_id)
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+            _manager.resume_interrupted()
+    return _manager
@@ -0,0 +1,171 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+import settings
+from camera import LatestFrameGrabber
+from smoothing import DetectionSmoother
+from tracker import Tracker
+
+logger = logging.getLogger(__name__)
+
+IDLE_TIMEOUT = getattr(settings, "LIVE_IDLE_TIMEOUT", 10.0)
+LIVE_REFRESH_SECONDS = getattr(settings, "LIVE_REFRESH_SECONDS", 0.1)
+
+
+@dataclass
+class LiveSnapshot:
+    seq: int
+    annotated: object
+    result: object
+    captured_at: float
+    unique: tuple = None
+    smoothed: object = None
+    dropped: int = 0
+
+
+class LiveDetector:
+    # One capture + inference loop per camera, shared by every session watching it. Sessions
+    # only read the latest snapshot, so the Streamlit script thread never blocks on the camera.
+
+    def __init__(self, source, engine, idle_timeout=IDLE_TIMEOUT, annotate=None, track=True):
+        self.source = source
+        self.engine = engine
+        self.annotate = annotate or (lambda frame, result: result.plot(frame))
+        self.track = track
+        self.idle_timeout = idle_timeout
+        self.error = None
+        self._snapshot = None
+        self._viewers = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def attach(self, viewer_id):
+        with self._lock:
+            self._attach_locked(viewer_id)
+
+    def _attach_locked(self, viewer_id):
+        self._viewers[viewer_id] = time.monotonic()
+        if not self.running:
+            # Each worker gets its own stop event; a worker that is still shutting down keeps
+            # its (set) event and the new one waits for it to release the camera first
+            self.error = None
+            self._snapshot = None
+            self._stop = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run, args=(self._stop, self._thread), name="live-detector", daemon=True
+            )
+            self._thread.start()
+
+    def detach(self, viewer_id):
+        # Deciding that this was the last viewer and signalling the worker happen under one lock,
+        # so an attach() in between either keeps the worker or starts a fresh one
+        with self._lock:
+            self._viewers.pop(viewer_id, None)
+            if self._viewers:
+                return
+            self._stop.set()
+            thread = self._thread
+        self._join(thread)
+
+    def stop(self):
+        with self._lock:
+            self._stop.set()
+            thread = self._thread
+        self._join(thread)
+
+    @staticmethod
+    def _join(thread):
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def snapshot(self, viewer_id=None):
+        # Polling renews the viewer's lease. A viewer whose lease already expired (a throttled
+        # background tab, a slow rerun) joins again, restarting the worker if it stopped.
+        with self._lock:
+            if viewer_id is not None:
+                if viewer_id in self._viewers:
+                    self._viewers[viewer_id] = time.monotonic()
+                else:
+                    self._attach_locked(viewer_id)
+            return self._snapshot
+
+    def _idle(self, stop):
+        # Viewers whose session went away without pressing Stop stop refreshing their lease
+        now = time.monotonic()
+        with self._lock:
+            for viewer_id, seen in list(self._viewers.items()):
+                if now - seen > self.idle_timeout:
+                    del self._viewers[viewer_id]
+            if not self._viewers:
+                stop.set()
+            return stop.is_set()
+
+    def _publish(self, stop, snapshot=None, error=None):
+        # A worker that has been told to stop no longer overwrites what its successor shows
+        with self._lock:
+            if stop.is_set():
+                return
+            if snapshot is not None:
+                self._snapshot = snapshot
+            if error is not None:
+                self.error = error
+
+    def _run(self, stop, previous=None):
+        if previous is not None:
+            previous.join()
+        grabber = LatestFrameGrabber(self.source).start()
+        # Unique item counts cover one run of the camera, from the first viewer to the last
+        tracker = Tracker(self.engine.names) if self.track else None
+        smoother = DetectionSmoother(self.engine.names)
+        try:
+            while not self._idle(stop):
+                grabbed = grabber.read(timeout=0.5)
+                if grabbed is None:
+                    if grabber.failed:
+                        self._publish(stop, error="Could not access webcam.")
+                        return
+                    continue
+                frame, captured_at = grabbed
+                result = self.engine.detect(frame)
+                # Tracked boxes carry their ids, as in the video pipeline
+                shown = tracker.step(result) if tracker is not None else result
+                smoothed, _ = smoother.update(result)
+                snapshot = LiveSnapshot(
+                    seq=(self._snapshot.seq + 1) if self._snapshot else 1,
+                    annotated=self.annotate(frame, shown),
+                    result=result,
+                    captured_at=captured_at,
+                    unique=tracker.unique_counts() if tracker is not None else None,
+                    smoothed=smoothed,
+                    dropped=grabber.dropped,
+                )
+                self._publish(stop, snapshot=snapshot)
+        except Exception as e:
+            logger.exception("Live detection on %s failed", self.source)
+            self._publish(stop, error=str(e))
+        finally:
+            with self._lock:
+                stop.set()
+                # Nobody should keep seeing the last frame of a camera that is no longer read
+                if stop is self._stop:
+                    self._snapshot = None
+            grabber.stop()
+
+
+_detectors = {}
+_detectors_lock = threading.Lock()
+
+
+def get_live_detector(source, engine, annotate=None):
+    with _detectors_lock:
+        detector = _detectors.get(source)
+        if detector is None:
+            detector = _detectors[source] = LiveDetector(source, engine, annotate=annotate)
+    return detector
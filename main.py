@@ -1,5 +1,34 @@
+import logging
+import os
+import threading
+import time
+
+_script_start = time.perf_counter()
+
 import streamlit as st
-import app  # Make sure app.py has a function run_app()
+
+# app.py pulls in OpenCV and ultralytics, so it is only imported on the detection page
+
+logger = logging.getLogger(__name__)
+
+
+def _preload_models():
+    import settings
+
+    if getattr(settings, "PRELOAD_MODEL", True):
+        import model_pool
+
+        model_pool.get_pool()
+
+
+@st.cache_resource
+def start_model_preload():
+    # Loads and warms up the model pool once per server process, off the script thread
+    if os.environ.get("ECODETECT_PRELOAD_MODEL", "1") == "0":
+        return None
+    thread = threading.Thread(target=_preload_models, name="model-preload", daemon=True)
+    thread.start()
+    return thread
 
 st.set_page_config(
     page_title="🌱 EcoDetect - Smart Waste Detection",
@@ -803,6 +832,8 @@ if "scroll_to" in st.session_state and st.session_state.scroll_to:
 # Render layout based on current page
 if st.session_state.page == "app":
     # Special layout for detection app
+    import app  # Make sure app.py has a function run_app()
+
     app.run_app()
 else:
     # Standard layout for other pages
@@ -828,3 +859,13 @@ else:
         contact_page()
     else:
         st.error("Page not found.")
+
+logger.info(
+    "Rendered page '%s' in %.0f ms",
+    st.session_state.page,
+    (time.perf_counter() - _script_start) * 1000,
+)
+
+# Started only once the first page has been rendered, so loading the models never competes
+# with that render for the CPU and the GIL
+start_model_preload()
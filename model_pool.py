@@ -0,0 +1,122 @@
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+import settings
+from detector import DEFAULT_BATCH_SIZE, DEFAULT_CONF, DetectionEngine
+from preprocessing import FRAME_SIZE
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = getattr(settings, "MODEL_POOL_SIZE", 2)
+# Warmed up at the shape video and camera frames arrive in
+WARMUP_SHAPE = (FRAME_SIZE[1], FRAME_SIZE[0], 3)
+
+
+class ModelPool:
+    def __init__(self, size=POOL_SIZE, model_path=None, conf=DEFAULT_CONF, batch_size=DEFAULT_BATCH_SIZE):
+        self.size = max(1, int(size))
+        self.model_path = model_path
+        self.conf = conf
+        self.batch_size = batch_size
+        self.timings = {"load_ms": [], "warmup_ms": []}
+        self._idle = queue.Queue()
+        self._engines = []
+        self._lock = threading.Lock()
+        self._started = False
+
+    def _create(self):
+        start = time.perf_counter()
+        engine = DetectionEngine(model_path=self.model_path, conf=self.conf, batch_size=self.batch_size)
+        loaded = time.perf_counter()
+        # The first forward pass builds the graph and allocates buffers; pay for it here
+        engine.predict([np.zeros(WARMUP_SHAPE, dtype=np.uint8)])
+        warmed = time.perf_counter()
+        self.timings["load_ms"].append((loaded - start) * 1000)
+        self.timings["warmup_ms"].append((warmed - loaded) * 1000)
+        logger.info(
+            "Model instance %d ready: load %.0f ms, warm-up %.0f ms",
+            len(self._engines) + 1, (loaded - start) * 1000, (warmed - loaded) * 1000,
+        )
+        return engine
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return self
+            for _ in range(self.size):
+                engine = self._create()
+                self._engines.append(engine)
+                self._idle.put(engine)
+            self._started = True
+        return self
+
+    def close(self):
+        with self._lock:
+            self._engines.clear()
+            self._idle = queue.Queue()
+            self._started = False
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        if not self._started:
+            self.start()
+        idle = self._idle
+        engine = idle.get(timeout=timeout)
+        try:
+            yield engine
+        finally:
+            idle.put(engine)
+
+    # Engine-compatible interface so callers can use the pool in place of a DetectionEngine
+
+    def predict(self, frames, conf=None):
+        with self.acquire() as engine:
+            return engine.predict(frames, conf=conf)
+
+    def predict_batches(self, frames, batch_size=None, conf=None):
+        with self.acquire() as engine:
+            yield from engine.predict_batches(frames, batch_size=batch_size, conf=conf)
+
+    def detect(self, frame, conf=None):
+        with self.acquire() as engine:
+            return engine.detect(frame, conf=conf)
+
+    @property
+    def names(self):
+        if not self._started:
+            self.start()
+        return self._engines[0].names
+
+    def summary(self):
+        load, warmup = self.timings["load_ms"], self.timings["warmup_ms"]
+        if not load:
+            return "Model pool not started"
+        return (
+            f"{len(load)} model instance(s) · load {sum(load) / len(load):.0f} ms · "
+            f"warm-up {sum(warmup) / len(warmup):.0f} ms"
+        )
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ModelPool()
+    return _pool.start()
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
@@ -0,0 +1,126 @@
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+import settings
+
+INPUT_SIZE = getattr(settings, "INPUT_SIZE", 640)
+LETTERBOX = getattr(settings, "LETTERBOX", True)
+# (x1, y1, x2, y2) as fractions of the frame, e.g. (0.1, 0.3, 0.9, 1.0) for a conveyor belt
+ROI = getattr(settings, "ROI", None)
+GRAYSCALE = getattr(settings, "GRAYSCALE", False)
+DENOISE = getattr(settings, "DENOISE", False)
+PAD_COLOR = (114, 114, 114)
+
+
+def frame_size(input_size=INPUT_SIZE):
+    # 16:9 canvas for video and camera frames, as wide as the model input
+    return input_size, int(input_size * 9 / 16)
+
+
+FRAME_SIZE = getattr(settings, "FRAME_SIZE", frame_size())
+
+
+def letterbox(image, size, color=PAD_COLOR):
+    # Scales to fit inside size (width, height) without distortion and pads the remainder
+    width, height = size
+    h, w = image.shape[:2]
+    scale = min(width / w, height / h)
+    nw, nh = int(round(w * scale)), int(round(h * scale))
+    canvas = np.full((height, width) + image.shape[2:], color if image.ndim == 3 else color[0], dtype=image.dtype)
+    top, left = (height - nh) // 2, (width - nw) // 2
+    canvas[top:top + nh, left:left + nw] = cv2.resize(image, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    return canvas
+
+
+def crop_roi(image, roi):
+    h, w = image.shape[:2]
+    x1, y1, x2, y2 = roi
+    return image[int(y1 * h):int(y2 * h), int(x1 * w):int(x2 * w)]
+
+
+class Preprocessor:
+    # The one place frames are shaped before inference, shared by uploads, video decoding and
+    # cameras: crop to the ROI, optional grayscale and denoise, then letterbox (or stretch) to
+    # size. size=None keeps the resolution, for still images the model scales itself.
+
+    def __init__(self, size=FRAME_SIZE, letterbox=LETTERBOX, roi=ROI, grayscale=GRAYSCALE, denoise=DENOISE):
+        self.size = tuple(size) if size else None
+        self.letterbox = letterbox
+        self.roi = roi
+        self.grayscale = grayscale
+        self.denoise = denoise
+
+    def __call__(self, frame):
+        if self.roi:
+            frame = crop_roi(frame, self.roi)
+        if self.grayscale:
+            # Kept three-channel, which is what the model expects
+            frame = cv2.cvtColor(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), cv2.COLOR_GRAY2BGR)
+        if self.denoise:
+            frame = cv2.medianBlur(frame, 3)
+        if self.size and frame.shape[1::-1] != self.size:
+            frame = letterbox(frame, self.size) if self.letterbox else cv2.resize(frame, self.size)
+        elif self.roi:
+            frame = np.ascontiguousarray(frame)
+        return frame
+
+
+def _sample_frames(source, count):
+    image = cv2.imread(source)
+    if image is not None:
+        return [image]
+    cap = cv2.VideoCapture(source)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise ValueError(f"Could not read {source}")
+    return frames
+
+
+def benchmark(source, sizes=(320, 480, 640, 960, 1280), frames=20):
+    from detector import DetectionEngine
+
+    samples = _sample_frames(source, frames)
+    engine = DetectionEngine()
+    rows = []
+    for input_size in sizes:
+        prepare = Preprocessor(frame_size(input_size))
+        engine.imgsz = input_size
+        engine.detect(prepare(samples[0]))  # warm-up at this size
+        prep_time = infer_time = 0.0
+        detections = 0
+        for frame in samples:
+            start = time.perf_counter()
+            prepared = prepare(frame)
+            prepared_at = time.perf_counter()
+            result = engine.detect(prepared)
+            prep_time += prepared_at - start
+            infer_time += time.perf_counter() - prepared_at
+            detections += len(result.class_ids)
+        n = len(samples)
+        rows.append((input_size, prep_time * 1000 / n, infer_time * 1000 / n, detections / n))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure latency and detections per input size.")
+    parser.add_argument("source", help="A video or image from the site's camera")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[320, 480, 640, 960, 1280])
+    parser.add_argument("--frames", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    print(f"{'input size':>10} {'preprocess ms':>14} {'inference ms':>13} {'detections':>11}")
+    for input_size, prep_ms, infer_ms, detections in benchmark(args.source, args.sizes, args.frames):
+        print(f"{input_size:>10} {prep_ms:>14.2f} {infer_ms:>13.1f} {detections:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import settings
+from backends import EXPORT_IMGSZ, export_model, exported_path, load_backend_model, move_into_place
+from preprocessing import FRAME_SIZE, INPUT_SIZE, letterbox
+
+CALIBRATION_DIR = getattr(settings, "CALIBRATION_DIR", "calibration_images")
+CALIBRATION_IMAGES = getattr(settings, "CALIBRATION_IMAGES", 200)
+VARIANTS = ("pytorch", "onnx", "onnx_int8", "openvino")
+
+
+def preprocess(image, imgsz=EXPORT_IMGSZ):
+    # Same letterbox + RGB + [0, 1] scaling the ultralytics predictor applies before the graph
+    canvas = letterbox(image, (imgsz, imgsz))
+    blob = canvas[:, :, ::-1].transpose(2, 0, 1).astype(np.float32) / 255.0
+    return blob[None]
+
+
+def calibration_images(folder=CALIBRATION_DIR, limit=CALIBRATION_IMAGES):
+    paths = sorted(
+        p for p in Path(folder).iterdir() if p.suffix.lower() in (".jpg", ".jpeg", ".png")
+    )[:limit]
+    if not paths:
+        raise FileNotFoundError(f"No calibration images found in {folder}")
+    return paths
+
+
+def quantize_model(weights=None, calibration_dir=CALIBRATION_DIR, limit=CALIBRATION_IMAGES,
+                   imgsz=EXPORT_IMGSZ, force=False):
+    from onnxruntime.quantization import CalibrationDataReader, QuantType, quantize_static
+
+    weights = weights or settings.DETECTION_MODEL
+    target = exported_path(weights, "onnx_int8")
+    if target.exists() and not force:
+        return target
+
+    fp32 = export_model(weights, "onnx", imgsz=imgsz)
+    paths = calibration_images(calibration_dir, limit)
+
+    class FolderReader(CalibrationDataReader):
+        def __init__(self, input_name):
+            self.input_name = input_name
+            self.paths = iter(paths)
+
+        def get_next(self):
+            for path in self.paths:
+                image = cv2.imread(str(path))
+                if image is not None:
+                    return {self.input_name: preprocess(image, imgsz)}
+            return None
+
+    import onnxruntime as ort
+
+    input_name = ort.InferenceSession(str(fp32), providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    with tempfile.TemporaryDirectory(dir=target.parent, prefix=".export-") as staging:
+        staged = Path(staging) / target.name
+        quantize_static(
+            str(fp32), str(staged), FolderReader(input_name),
+            activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8, per_channel=True,
+        )
+        return move_into_place(staged, target)
+
+
+def measure_variant(variant, weights=None, data=None, runs=20, imgsz=EXPORT_IMGSZ):
+    model = load_backend_model(weights, variant)
+    frame = np.random.randint(0, 255, (FRAME_SIZE[1], FRAME_SIZE[0], 3), dtype=np.uint8)
+    model.predict(frame, imgsz=INPUT_SIZE, verbose=False)
+    start = time.perf_counter()
+    for _ in range(runs):
+        model.predict(frame, imgsz=INPUT_SIZE, verbose=False)
+    latency = (time.perf_counter() - start) * 1000 / runs
+    # ru_maxrss is in KiB on Linux; taken before validation so it reflects steady-state inference
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    report = {"variant": variant, "ms_per_frame": latency, "peak_rss_mb": peak_rss,
+              "map50": None, "map50_95": None}
+    if data:
+        metrics = model.val(data=data, imgsz=imgsz, batch=1, verbose=False, plots=False)
+        report["map50"] = float(metrics.box.map50)
+        report["map50_95"] = float(metrics.box.map)
+    return report
+
+
+def compare_variants(variants=VARIANTS, weights=None, data=None, runs=20):
+    # Each variant runs in its own interpreter so memory figures do not bleed into each other
+    reports = []
+    for variant in variants:
+        command = [sys.executable, __file__, "--probe", variant, "--runs", str(runs)]
+        if weights:
+            command += ["--weights", str(weights)]
+        if data:
+            command += ["--data", str(data)]
+        probe = subprocess.run(command, capture_output=True, text=True)
+        try:
+            reports.append(json.loads(probe.stdout.strip().splitlines()[-1]))
+        except (IndexError, ValueError):
+            # A backend that is not installed or fails to export leaves the other rows intact
+            lines = probe.stderr.strip().splitlines()
+            reports.append({
+                "variant": variant, "map50": None, "map50_95": None, "ms_per_frame": None,
+                "peak_rss_mb": None, "error": lines[-1] if lines else f"exit code {probe.returncode}",
+            })
+    return reports
+
+
+def format_report(reports):
+    def fmt(value, spec):
+        return "n/a" if value is None else format(value, spec)
+
+    lines = [
+        "| variant | mAP50 | mAP50-95 | ms / frame | peak RSS (MB) |",
+        "| --- | --- | --- | --- | --- |",
+    ]
+    for r in reports:
+        lines.append(
+            f"| {r['variant']} | {fmt(r['map50'], '.3f')} | {fmt(r['map50_95'], '.3f')} | "
+            f"{fmt(r['ms_per_frame'], '.1f')} | {fmt(r['peak_rss_mb'], '.0f')} |"
+        )
+    unavailable = [f"{r['variant']}: {r['error']}" for r in reports if r.get("error")]
+    if unavailable:
+        lines += ["", "Unavailable: " + "; ".join(unavailable)]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quantize the detection model to INT8 and compare variants.")
+    parser.add_argument("--weights", default=None)
+    parser.add_argument("--calibration-dir", default=CALIBRATION_DIR)
+    parser.add_argument("--calibration-images", type=int, default=CALIBRATION_IMAGES)
+    parser.add_argument("--data", default=None, help="YOLO dataset yaml of the labelled holdout set")
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=VARIANTS)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--report", default=None, help="Also write the report as JSON to this path")
+    parser.add_argument("--probe", default=None, choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.probe:
+        print(json.dumps(measure_variant(args.probe, args.weights, args.data, args.runs)))
+        return
+
+    if "onnx_int8" in args.variants:
+        try:
+            print(f"INT8 model: {quantize_model(args.weights, args.calibration_dir, args.calibration_images)}")
+        except Exception as e:
+            print(f"INT8 model not built: {e}", file=sys.stderr)
+    reports = compare_variants(args.variants, args.weights, args.data, args.runs)
+    print(format_report(reports))
+    if args.report:
+        Path(args.report).write_text(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
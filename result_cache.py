@@ -0,0 +1,165 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import replace
+
+import settings
+from backends import INFERENCE_BACKEND
+from preprocessing import INPUT_SIZE
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = getattr(settings, "RESULT_CACHE_SIZE", 128)
+# Annotated images are full-resolution arrays, so the in-memory cache is also bounded by size
+CACHE_MAX_MB = getattr(settings, "RESULT_CACHE_MAX_MB", 512)
+CACHE_TTL = getattr(settings, "RESULT_CACHE_TTL", 3600)
+CACHE_DIR = getattr(settings, "RESULT_CACHE_DIR", None)
+
+
+def model_version(path=None, backend=None, input_size=INPUT_SIZE):
+    # Everything besides the pixels that changes what the model returns for an image
+    path = str(path or settings.DETECTION_MODEL)
+    try:
+        mtime = int(os.path.getmtime(path))
+    except OSError:
+        mtime = 0
+    return f"{path}:{backend or INFERENCE_BACKEND}:{mtime}:{input_size}"
+
+
+class ResultCache:
+    def __init__(self, max_entries=CACHE_SIZE, ttl=CACHE_TTL, directory=CACHE_DIR, version=None,
+                 max_bytes=CACHE_MAX_MB * 1024 * 1024):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.directory = directory
+        self.version = version or model_version()
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def key(self, image, conf, variant=""):
+        # variant distinguishes other ways of analysing the same pixels, such as tiled inference
+        digest = hashlib.sha1(image.tobytes())
+        digest.update(f"{image.shape}:{image.dtype}:{self.version}:{conf}:{variant}".encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def _expired(self, stored_at):
+        return bool(self.ttl) and time.time() - stored_at > self.ttl
+
+    def _load(self, key):
+        # Returns (stored_at, value). The file's mtime tracks use for pruning, so the age comes
+        # from the time stored inside it.
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                record = pickle.load(f)
+            stored_at, value = record["stored_at"], record["value"]
+            if self._expired(stored_at):
+                os.remove(path)
+                return None
+        except OSError:
+            return None
+        except Exception as e:
+            # Written by an older FrameResult or module layout, or truncated: treat as a miss
+            logger.info("Discarding unreadable cached result %s: %s", key, e)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        # Read entries count as recently used when the folder is pruned
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return stored_at, value
+
+    def _prune_disk(self):
+        # The folder holds at most max_entries results; the least recently used go first
+        try:
+            paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                     if name.endswith(".pkl")]
+            if len(paths) <= self.max_entries:
+                return
+            paths.sort(key=os.path.getmtime)
+            for path in paths[:len(paths) - self.max_entries]:
+                os.remove(path)
+        except OSError as e:
+            logger.warning("Could not prune result cache folder %s: %s", self.directory, e)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[0]):
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+        loaded = self._load(key) if self.directory else None
+        with self._lock:
+            if loaded is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._insert(key, loaded[1], stored_at=loaded[0])
+        return loaded[1]
+
+    def _insert(self, key, value, stored_at=None):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[2]
+        # The annotated image dominates; the detections are a few hundred bytes
+        size = value[0].nbytes
+        self._entries[key] = (stored_at or time.time(), value, size)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._bytes -= self._entries.popitem(last=False)[1][2]
+
+    def put(self, key, annotated, result):
+        # The raw ultralytics Results keeps a full copy of the input frame, so it is not cached
+        value = (annotated, replace(result, raw=None))
+        stored_at = time.time()
+        with self._lock:
+            self._insert(key, value, stored_at)
+        if self.directory:
+            path = self._path(key)
+            try:
+                # Renamed into place so a concurrent reader never sees a half-written file
+                with open(path + ".tmp", "wb") as f:
+                    pickle.dump({"stored_at": stored_at, "value": value}, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(path + ".tmp", path)
+            except OSError as e:
+                logger.warning("Could not persist cached result %s: %s", key, e)
+            self._prune_disk()
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+    return _cache
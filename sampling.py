@@ -0,0 +1,72 @@
+import cv2
+import numpy as np
+
+SAMPLING_MODES = ("every_frame", "stride", "target_fps", "scene_change")
+
+
+class EveryFrameSampler:
+    def should_infer(self, index, frame):
+        return True
+
+
+class StrideSampler:
+    def __init__(self, stride):
+        self.stride = max(1, int(stride))
+
+    def should_infer(self, index, frame):
+        return index % self.stride == 0
+
+
+class TargetFPSSampler:
+    def __init__(self, source_fps, target_fps):
+        # Unknown container FPS (0 or NaN from OpenCV) is treated as 30
+        self.source_fps = source_fps if source_fps and source_fps > 0 else 30.0
+        self.interval = 1.0 / max(float(target_fps), 1e-3)
+        self.next_time = 0.0
+
+    def should_infer(self, index, frame):
+        timestamp = index / self.source_fps
+        if timestamp + 1e-9 < self.next_time:
+            return False
+        while self.next_time <= timestamp + 1e-9:
+            self.next_time += self.interval
+        return True
+
+
+class SceneChangeSampler:
+    def __init__(self, threshold=0.04, max_gap=30, thumb_size=(64, 36)):
+        # threshold is the mean absolute grey-level difference, as a fraction of 255,
+        # between a thumbnail of the frame and the last frame sent to the model
+        self.threshold = threshold
+        self.max_gap = max_gap
+        self.thumb_size = thumb_size
+        self.reference = None
+        self.last_index = None
+
+    def _thumbnail(self, frame):
+        grey = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(grey, self.thumb_size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def should_infer(self, index, frame):
+        thumb = self._thumbnail(frame)
+        changed = (
+            self.reference is None
+            or (self.max_gap and index - self.last_index >= self.max_gap)
+            or np.abs(thumb - self.reference).mean() / 255.0 >= self.threshold
+        )
+        if changed:
+            self.reference = thumb
+            self.last_index = index
+        return bool(changed)
+
+
+def make_sampler(mode="every_frame", stride=5, source_fps=30.0, target_fps=2.0, threshold=0.04, max_gap=30):
+    if mode == "every_frame":
+        return EveryFrameSampler()
+    if mode == "stride":
+        return StrideSampler(stride)
+    if mode == "target_fps":
+        return TargetFPSSampler(source_fps, target_fps)
+    if mode == "scene_change":
+        return SceneChangeSampler(threshold=threshold, max_gap=max_gap)
+    raise ValueError(f"Unknown sampling mode: {mode}")
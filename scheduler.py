@@ -0,0 +1,159 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import settings
+from detector import batched
+from model_pool import get_pool
+
+MAX_BATCH = getattr(settings, "SCHEDULER_MAX_BATCH", 16)
+MAX_WAIT_MS = getattr(settings, "SCHEDULER_MAX_WAIT_MS", 5)
+
+_STOP = object()
+
+
+class _Request:
+    __slots__ = ("frame", "conf", "future", "queued_at")
+
+    def __init__(self, frame, conf):
+        self.frame = frame
+        self.conf = conf
+        self.future = Future()
+        self.queued_at = time.perf_counter()
+
+
+class InferenceScheduler:
+    # Collects single-frame requests from any thread for up to max_wait_ms (or until max_batch
+    # are waiting), runs them as one forward pass and hands each caller its result via a future.
+    # It exposes the same predict/detect interface as DetectionEngine and ModelPool.
+
+    def __init__(self, engine, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, workers=None):
+        self.engine = engine
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max_wait_ms / 1000
+        self.workers = workers or getattr(engine, "size", 1)
+        self.conf = engine.conf
+        self.names = engine.names
+        self.batch_size = engine.batch_size
+        self._queue = queue.Queue()
+        self._threads = []
+        self._metrics_lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._queue_wait = 0.0
+        self._max_queue_wait = 0.0
+
+    def start(self):
+        if not self._threads:
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"inference-scheduler-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def stop(self):
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, frame, conf=None):
+        request = _Request(frame, self.conf if conf is None else conf)
+        self._queue.put(request)
+        return request.future
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is _STOP:
+                # Let another worker (or the next loop) see the stop marker
+                self._queue.put(_STOP)
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            started = time.perf_counter()
+            waits = [started - request.queued_at for request in batch]
+            with self._metrics_lock:
+                self._batches += 1
+                self._requests += len(batch)
+                self._queue_wait += sum(waits)
+                self._max_queue_wait = max(self._max_queue_wait, *waits)
+
+            # Requests with different thresholds cannot share a forward pass
+            groups = {}
+            for request in batch:
+                groups.setdefault(request.conf, []).append(request)
+            for conf, requests in groups.items():
+                requests = [r for r in requests if r.future.set_running_or_notify_cancel()]
+                if not requests:
+                    continue
+                try:
+                    results = self.engine.predict([r.frame for r in requests], conf=conf)
+                except Exception as e:
+                    for request in requests:
+                        request.future.set_exception(e)
+                    continue
+                for request, result in zip(requests, results):
+                    request.future.set_result(result)
+
+    def predict(self, frames, conf=None):
+        futures = [self.submit(frame, conf) for frame in frames]
+        return [future.result() for future in futures]
+
+    def predict_batches(self, frames, batch_size=None, conf=None):
+        for chunk in batched(frames, batch_size or self.batch_size):
+            yield from self.predict(chunk, conf=conf)
+
+    def detect(self, frame, conf=None):
+        return self.submit(frame, conf).result()
+
+    def metrics(self):
+        with self._metrics_lock:
+            batches, requests = self._batches, self._requests
+            return {
+                "batches": batches,
+                "requests": requests,
+                "avg_batch_size": requests / batches if batches else 0.0,
+                "batch_fill_rate": requests / (batches * self.max_batch) if batches else 0.0,
+                "avg_queue_wait_ms": self._queue_wait * 1000 / requests if requests else 0.0,
+                "max_queue_wait_ms": self._max_queue_wait * 1000,
+            }
+
+    def summary(self):
+        m = self.metrics()
+        engine_summary = self.engine.summary() if hasattr(self.engine, "summary") else ""
+        return (
+            f"{engine_summary} · batch fill {m['batch_fill_rate']:.0%} "
+            f"(avg {m['avg_batch_size']:.1f}) · queue wait {m['avg_queue_wait_ms']:.1f} ms"
+        ).lstrip(" ·")
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = InferenceScheduler(get_pool()).start()
+    return _scheduler
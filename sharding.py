@@ -0,0 +1,132 @@
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
+
+import cv2
+
+import settings
+from video_pipeline import FRAME_SIZE, VideoPipeline, decode_frames, open_writer, video_info
+
+SHARD_WORKERS = getattr(settings, "SHARD_WORKERS", os.cpu_count() or 1)
+MIN_SEGMENT_FRAMES = 100
+
+
+def split_ranges(total, segments, min_frames=MIN_SEGMENT_FRAMES):
+    # Half-open [start, end) frame ranges; very short videos get fewer, longer segments. The
+    # container's frame count is only an estimate, so the last range (end=None) runs to the end
+    # of the file, and an unknown count (0 or negative) gives one segment covering everything.
+    if total <= 0:
+        return [(0, None)]
+    segments = max(1, min(segments, total // max(min_frames, 1) or 1))
+    bounds = [round(i * total / segments) for i in range(segments + 1)]
+    ranges = [(bounds[i], bounds[i + 1]) for i in range(segments) if bounds[i] < bounds[i + 1]]
+    return ranges[:-1] + [(ranges[-1][0], None)]
+
+
+def process_segment(video_path, start, end, sampling=None, annotated_path=None, fps=30.0, workers=1):
+    # Runs in a worker process with its own model. OpenCV's FFmpeg backend seeks with
+    # CAP_PROP_POS_FRAMES by jumping to the previous keyframe and decoding forward.
+    from annotator import get_annotator
+    from detector import process_engine
+    from sampling import make_sampler
+
+    engine = process_engine(workers)
+    annotator = get_annotator(engine.names)
+    sampler = make_sampler(source_fps=fps, **(sampling or {}))
+    pipeline = VideoPipeline(engine, sampler=sampler)
+    frames = decode_frames(video_path, FRAME_SIZE, start)
+    if end is not None:
+        frames = islice(frames, end - start)
+    writer = None
+    if annotated_path:
+        writer = open_writer(annotated_path, fps, FRAME_SIZE)
+    results = []
+    try:
+        for index, frame, result in pipeline.run(frames, start=start):
+            results.append({"frame": index, **result.to_dict()})
+            if writer is not None:
+                writer.write(annotator.draw(frame, result))
+    finally:
+        if writer is not None:
+            writer.release()
+    return {"start": start, "end": end, "frames": results, "inferred": pipeline.stats["inferred"]}
+
+
+def concat_videos(paths, output_path, fps, size=FRAME_SIZE):
+    writer = open_writer(output_path, fps, size)
+    try:
+        for path in paths:
+            cap = cv2.VideoCapture(path)
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                writer.write(frame)
+            cap.release()
+    finally:
+        writer.release()
+
+
+def analyse_sharded(video_path, workers=SHARD_WORKERS, sampling=None, output_path=None, on_segment=None):
+    total, fps = video_info(video_path)
+    fps = fps if fps and fps > 0 else 30.0
+    ranges = split_ranges(total, workers)
+    tmpdir = tempfile.mkdtemp(prefix="ecodetect-shards-") if output_path else None
+    segment_paths = {r: os.path.join(tmpdir, f"{r[0]:08d}.mp4") if tmpdir else None for r in ranges}
+    segments = {}
+    try:
+        # spawn, not fork: every worker loads its own model instead of inheriting threads and tensors
+        with ProcessPoolExecutor(max_workers=len(ranges) or 1,
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [
+                executor.submit(process_segment, video_path, start, end, sampling, segment_paths[(start, end)], fps,
+                                len(ranges))
+                for start, end in ranges
+            ]
+            for future in as_completed(futures):
+                segment = future.result()
+                segments[segment["start"]] = segment
+                if on_segment:
+                    on_segment(len(segments), len(ranges), segment)
+
+        ordered = [segments[start] for start, _ in ranges]
+        if output_path:
+            concat_videos([segment_paths[r] for r in ranges], output_path, fps)
+    finally:
+        if tmpdir:
+            for path in segment_paths.values():
+                if os.path.exists(path):
+                    os.remove(path)
+            os.rmdir(tmpdir)
+
+    frames = [frame for segment in ordered for frame in segment["frames"]]
+    stats = {"frames": len(frames), "inferred": sum(s["inferred"] for s in ordered), "segments": len(ranges)}
+    return frames, stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse a long video in parallel frame-range segments.")
+    parser.add_argument("video")
+    parser.add_argument("--workers", type=int, default=SHARD_WORKERS)
+    parser.add_argument("--output", default=None, help="Write the annotated video here")
+    parser.add_argument("--results", default=None, help="Write per-frame detections here as JSON lines")
+    args = parser.parse_args(argv)
+
+    def report(done, total, segment):
+        last = segment["frames"][-1]["frame"] if segment["frames"] else segment["start"]
+        print(f"segment {done}/{total}: frames {segment['start']}-{last}", flush=True)
+
+    frames, stats = analyse_sharded(args.video, args.workers, output_path=args.output, on_segment=report)
+    if args.results:
+        with open(args.results, "w") as f:
+            for frame in frames:
+                f.write(json.dumps(frame) + "\n")
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
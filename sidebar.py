@@ -0,0 +1,160 @@
+import argparse
+from functools import lru_cache
+
+import streamlit as st
+
+import settings
+
+HEADER_HTML = """
+    <div style="background: linear-gradient(135deg, #4CAF50 0%, #45a049 100%);
+               color: white; padding: 1rem; border-radius: 10px; margin-bottom: 1rem;">
+        <h3 style="margin: 0; text-align: center;">🧾 Detection Results</h3>
+    </div>
+"""
+
+# Same order as the (r, nr, h, o, b) buckets
+CATEGORY_STYLES = (
+    ("♻️ Recyclable", "#e8f5e8", "#4CAF50"),
+    ("🚫 Non-Recyclable", "#ffebee", "#f44336"),
+    ("☣️ Hazardous", "#fff3e0", "#ff9800"),
+    ("🍃 Organic", "#f3e5f5", "#9c27b0"),
+    ("🌱 Biodegradable", "#e0f2f1", "#00bcd4"),
+)
+
+
+@lru_cache(maxsize=None)
+def item_html(item):
+    # Name formatting and the disposal lookup happen once per class, not once per frame
+    item_name = item.replace("_", " ").title()
+    disposal = settings.DISPOSAL_METHODS.get(item, "No disposal info available.")
+    return f"""
+        <div style="background: white; padding: 0.7rem; border-radius: 6px;
+                   margin-bottom: 0.4rem; box-shadow: 0 1px 3px rgba(0,0,0,0.1);">
+            <strong style="color: #333; font-size: 0.9rem;">📦 {item_name}</strong><br>
+            <span style="color: #666; font-size: 0.8rem;">
+                🗑️ <em>{disposal}</em>
+            </span>
+        </div>
+    """
+
+
+def category_html(style, items):
+    category_name, bg_color, border_color = style
+    return f"""
+        <div style="background: {bg_color}; padding: 1rem; border-radius: 8px;
+                   border-left: 3px solid {border_color}; margin-bottom: 1rem;">
+            <h4 style="color: {border_color}; margin: 0 0 0.5rem 0; font-size: 1rem;">
+                {category_name} ({len(items)})
+            </h4>
+            {"".join(item_html(item) for item in sorted(items))}
+        </div>
+    """
+
+
+class SidebarResults:
+    # A fixed set of st.empty() slots (header plus one per category), created on first use in
+    # a script run. A slot is only sent to the browser again when its own items changed.
+
+    def __init__(self, container=None):
+        self.container = container
+        self._slots = None
+        self._shown = None
+
+    def update(self, r, nr, h, o, b, all_detected):
+        if self._slots is None:
+            container = self.container if self.container is not None else st.sidebar
+            self._slots = [container.empty() for _ in range(len(CATEGORY_STYLES) + 1)]
+            self._shown = [None] * len(self._slots)
+
+        wanted = [bool(all_detected)] + [frozenset(items) for items in (r, nr, h, o, b)]
+        for i, (slot, state) in enumerate(zip(self._slots, wanted)):
+            if state == self._shown[i]:
+                continue
+            self._shown[i] = state
+            if not state:
+                slot.empty()
+            elif i == 0:
+                slot.markdown(HEADER_HTML, unsafe_allow_html=True)
+            else:
+                slot.markdown(category_html(CATEGORY_STYLES[i - 1], state), unsafe_allow_html=True)
+
+
+def render_full(r, nr, h, o, b, all_detected):
+    # The previous renderer: a new sidebar element per category and item on every call
+    if not all_detected:
+        return
+    st.sidebar.markdown(HEADER_HTML, unsafe_allow_html=True)
+    for items, (category_name, bg_color, border_color) in zip((r, nr, h, o, b), CATEGORY_STYLES):
+        if items:
+            st.sidebar.markdown(f"""
+                <div style="background: {bg_color}; padding: 1rem; border-radius: 8px;
+                           border-left: 3px solid {border_color}; margin-bottom: 1rem;">
+                    <h4 style="color: {border_color}; margin: 0 0 0.5rem 0; font-size: 1rem;">
+                        {category_name} ({len(items)})
+                    </h4>
+            """, unsafe_allow_html=True)
+            for item in sorted(items):
+                item_name = item.replace("_", " ").title()
+                disposal = settings.DISPOSAL_METHODS.get(item, "No disposal info available.")
+                st.sidebar.markdown(f"""
+                    <div style="background: white; padding: 0.7rem; border-radius: 6px;
+                               margin-bottom: 0.4rem; box-shadow: 0 1px 3px rgba(0,0,0,0.1);">
+                        <strong style="color: #333; font-size: 0.9rem;">📦 {item_name}</strong><br>
+                        <span style="color: #666; font-size: 0.8rem;">
+                            🗑️ <em>{disposal}</em>
+                        </span>
+                    </div>
+                """, unsafe_allow_html=True)
+            st.sidebar.markdown("</div>", unsafe_allow_html=True)
+
+
+def _benchmark_script(frames, renderer, change_every):
+    # Runs inside AppTest: the same detections arrive every frame, changing every change_every frames
+    import time
+
+    import streamlit as st
+
+    import settings
+    from detector import classify_items
+    from sidebar import SidebarResults, render_full
+
+    classes = sorted(set(settings.RECYCLABLE) | set(settings.NON_RECYCLABLE) | set(settings.HAZARDOUS)
+                     | set(settings.ORGANIC) | set(settings.BIODEGRADABLE))
+    sidebar = SidebarResults()
+    start = time.perf_counter()
+    for i in range(frames):
+        offset = (i // change_every) % max(len(classes), 1)
+        detected = set(classes[offset:offset + 6])
+        buckets = classify_items(detected)
+        if renderer == "full":
+            render_full(*buckets, detected)
+        else:
+            sidebar.update(*buckets, detected)
+    st.session_state.ms_per_frame = (time.perf_counter() - start) * 1000 / frames
+
+
+def benchmark(frames=300, change_every=10):
+    from streamlit.testing.v1 import AppTest
+
+    rows = []
+    for renderer in ("full", "incremental"):
+        at = AppTest.from_function(_benchmark_script, args=(frames, renderer, change_every), default_timeout=120)
+        at.run()
+        rows.append((renderer, at.session_state.ms_per_frame, len(at.sidebar.markdown)))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure per-frame sidebar rendering overhead.")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--change-every", type=int, default=10,
+                        help="Frames between changes of the detected classes")
+    args = parser.parse_args(argv)
+
+    print(f"{'renderer':<12} {'ms / frame':>10} {'sidebar elements':>17}")
+    for renderer, ms, elements in benchmark(args.frames, args.change_every):
+        print(f"{renderer:<12} {ms:>10.3f} {elements:>17}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+from collections import deque
+
+import numpy as np
+
+import settings
+from detector import CategoryTable, FrameResult
+
+SMOOTH_WINDOW = getattr(settings, "SMOOTH_WINDOW", 5)
+SMOOTH_ENTER = getattr(settings, "SMOOTH_ENTER", 3)
+SMOOTH_EXIT = getattr(settings, "SMOOTH_EXIT", 1)
+
+
+class DetectionSmoother:
+    # Sliding-window vote with hysteresis over the classes seen in each frame. A class joins the
+    # smoothed set once it was seen in `enter` of the last `window` frames and leaves only when
+    # seen in fewer than `exit` of them, so one missed frame no longer redraws the sidebar.
+
+    def __init__(self, names, window=SMOOTH_WINDOW, enter=SMOOTH_ENTER, exit=SMOOTH_EXIT):
+        self.table = CategoryTable(names)
+        self.enter = min(enter, window)
+        self.exit = min(exit, self.enter)
+        self._frames = deque(maxlen=window)
+        self._votes = np.zeros(len(self.table.names), dtype=np.int32)
+        self._active = np.zeros(len(self.table.names), dtype=bool)
+        self.result = FrameResult()
+
+    def update(self, result):
+        # Returns the smoothed result and whether its class set changed with this frame
+        present = np.zeros(len(self.table.names), dtype=bool)
+        present[np.asarray(result.class_ids, dtype=np.intp)] = True
+        if len(self._frames) == self._frames.maxlen:
+            self._votes -= self._frames[0]
+        self._frames.append(present)
+        self._votes += present
+
+        active = (self._votes >= self.enter) | (self._active & (self._votes >= self.exit))
+        if np.array_equal(active, self._active):
+            return self.result, False
+        self._active = active
+        class_ids = np.flatnonzero(active)
+        categories, counts = self.table.classify(class_ids)
+        self.result = FrameResult(
+            class_ids=class_ids,
+            class_names=self.table.names[class_ids],
+            categories=categories,
+            counts=counts,
+        )
+        return self.result, True
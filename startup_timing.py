@@ -0,0 +1,55 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+PAGES = ("home", "login", "signup", "about", "contact")
+HEAVY_MODULES = ("cv2", "ultralytics", "torch")
+
+# Runs in a fresh interpreter so every measurement is a true cold start
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("main.py", default_timeout=60)
+at.session_state.page = {page!r}
+at.run()
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "page": {page!r},
+    "ms": elapsed * 1000,
+    "errors": [str(e.value) for e in at.exception],
+    "heavy_imports": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure(page, preload=False):
+    # With preload on, main.py starts loading models once the page has rendered, as in production;
+    # heavy modules are only meaningful with it off, since the preload thread imports them too
+    env = dict(os.environ, ECODETECT_PRELOAD_MODEL="1" if preload else "0")
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(page=page, heavy=HEAVY_MODULES)],
+        capture_output=True, text=True, check=True, env=env,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold-start render time of the landing pages.")
+    parser.add_argument("--pages", nargs="+", default=list(PAGES))
+    args = parser.parse_args(argv)
+
+    print(f"{'page':<10} {'preload off (ms)':>17} {'preload on (ms)':>16}  heavy modules loaded by the page")
+    for page in args.pages:
+        result = measure(page)
+        with_preload = measure(page, preload=True)
+        heavy = ", ".join(result["heavy_imports"]) or "none"
+        print(f"{page:<10} {result['ms']:>17.0f} {with_preload['ms']:>16.0f}  {heavy}")
+        for error in result["errors"] + with_preload["errors"]:
+            print(f"  error: {error}")
+
+
+if __name__ == "__main__":
+    main()
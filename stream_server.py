@@ -0,0 +1,124 @@
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+
+import settings
+from camera import LatestFrameGrabber
+from model_pool import get_pool
+
+logger = logging.getLogger(__name__)
+
+CAMERA_SOURCES = getattr(settings, "CAMERA_SOURCES", {"webcam": settings.WEBCAM_PATH})
+
+
+def print_publisher(stream, captured_at, result):
+    message = {
+        "stream": stream,
+        "latency_ms": round((time.perf_counter() - captured_at) * 1000, 1),
+        **result.to_dict(),
+    }
+    print(json.dumps(message), flush=True)
+
+
+class StreamServer:
+    # One process ingests every camera; each step gathers the newest frame from every stream
+    # that has produced one and runs them through the model as a single batch.
+
+    def __init__(self, sources, engine=None, publishers=None, pace=False, loop=False):
+        self.engine = engine or get_pool()
+        self.grabbers = {
+            name: LatestFrameGrabber(source, pace=pace, loop=loop) for name, source in sources.items()
+        }
+        self.publishers = list(publishers) if publishers is not None else [print_publisher]
+        self.latest = {}
+        self.stats = {"steps": 0, "frames": 0}
+        self._lock = threading.Lock()
+        self._running = False
+
+    def subscribe(self, publisher):
+        self.publishers.append(publisher)
+
+    def start(self):
+        for grabber in self.grabbers.values():
+            grabber.start()
+        self._running = True
+        return self
+
+    def stop(self):
+        self._running = False
+        for grabber in self.grabbers.values():
+            grabber.stop()
+
+    @property
+    def alive(self):
+        return any(not grabber.failed for grabber in self.grabbers.values())
+
+    def step(self):
+        batch = []
+        for name, grabber in self.grabbers.items():
+            grabbed = grabber.read(timeout=0)
+            if grabbed is not None:
+                batch.append((name, *grabbed))
+        if not batch:
+            return 0
+        results = self.engine.predict([frame for _, frame, _ in batch])
+        with self._lock:
+            for (name, _, captured_at), result in zip(batch, results):
+                self.latest[name] = (result, captured_at)
+            self.stats["steps"] += 1
+            self.stats["frames"] += len(batch)
+        for (name, _, captured_at), result in zip(batch, results):
+            for publish in self.publishers:
+                publish(name, captured_at, result)
+        return len(batch)
+
+    def serve_forever(self, idle_sleep=0.005):
+        try:
+            while self._running and self.alive:
+                if not self.step():
+                    time.sleep(idle_sleep)
+            # Flush frames captured just before the last source ended
+            self.step()
+        finally:
+            self.stop()
+        logger.info(
+            "Processed %d frames in %d batched steps (%.1f streams per step)",
+            self.stats["frames"], self.stats["steps"],
+            self.stats["frames"] / max(self.stats["steps"], 1),
+        )
+
+
+def parse_sources(values):
+    sources = {}
+    for index, value in enumerate(values):
+        name, sep, source = value.partition("=")
+        if not sep:
+            name, source = f"cam{index}", value
+        sources[name] = int(source) if source.isdigit() else source
+    return sources
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run waste detection over several camera streams at once.")
+    parser.add_argument(
+        "sources", nargs="*",
+        help="name=source pairs; a source is a device index, RTSP URL or video file (default: CAMERA_SOURCES)",
+    )
+    parser.add_argument("--pace", action="store_true", help="Read video files at their recorded FPS")
+    parser.add_argument("--loop", action="store_true", help="Restart video files when they end")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    sources = parse_sources(args.sources) if args.sources else CAMERA_SOURCES
+    server = StreamServer(sources, pace=args.pace, loop=args.loop).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+import settings
+from detector import CategoryTable, FrameResult
+
+TILE_SIZE = getattr(settings, "TILE_SIZE", 640)
+TILE_OVERLAP = getattr(settings, "TILE_OVERLAP", 0.2)
+TILE_NMS_IOU = getattr(settings, "TILE_NMS_IOU", 0.5)
+
+
+def tile_windows(height, width, tile=TILE_SIZE, overlap=TILE_OVERLAP):
+    # (x1, y1, x2, y2) windows covering the image; the last row and column sit flush with the edge
+    step = max(1, int(tile * (1 - overlap)))
+
+    def starts(size):
+        if size <= tile:
+            return [0]
+        positions = list(range(0, size - tile, step))
+        return positions + [size - tile]
+
+    return [(x, y, min(x + tile, width), min(y + tile, height)) for y in starts(height) for x in starts(width)]
+
+
+def nms(boxes, scores, class_ids, iou_threshold=TILE_NMS_IOU):
+    # Per-class greedy NMS; offsetting boxes by class keeps different classes from suppressing each other
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.intp)
+    offset = boxes + (class_ids.astype(np.float32) * (boxes.max() + 1))[:, None]
+    x1, y1, x2, y2 = offset.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-6)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.intp)
+
+
+class TiledDetector:
+    # Sliced inference for photos much larger than the model input. Overlapping tiles (plus the
+    # whole image, for items bigger than a tile) go to the engine as one predict() call, which the
+    # scheduler and model pool spread over their workers; boxes are merged with cross-tile NMS.
+
+    def __init__(self, engine, tile=TILE_SIZE, overlap=TILE_OVERLAP, iou_threshold=TILE_NMS_IOU,
+                 include_full=True):
+        self.engine = engine
+        self.tile = tile
+        self.overlap = overlap
+        self.iou_threshold = iou_threshold
+        self.include_full = include_full
+        self.table = CategoryTable(engine.names)
+        self.conf = engine.conf
+
+    def detect(self, image, conf=None):
+        height, width = image.shape[:2]
+        if max(height, width) <= self.tile:
+            return self.engine.detect(image, conf=conf)
+
+        windows = tile_windows(height, width, self.tile, self.overlap)
+        crops = [np.ascontiguousarray(image[y1:y2, x1:x2]) for x1, y1, x2, y2 in windows]
+        if self.include_full:
+            windows.append((0, 0, width, height))
+            crops.append(image)
+        results = self.engine.predict(crops, conf=conf)
+
+        boxes = np.concatenate([
+            np.asarray(r.boxes, dtype=np.float32).reshape(-1, 4) + np.array([x1, y1, x1, y1], dtype=np.float32)
+            for r, (x1, y1, _, _) in zip(results, windows)
+        ])
+        scores = np.concatenate([np.asarray(r.confidences, dtype=np.float32) for r in results])
+        class_ids = np.concatenate([np.asarray(r.class_ids, dtype=np.intp) for r in results])
+        keep = nms(boxes, scores, class_ids, self.iou_threshold)
+
+        categories, counts = self.table.classify(class_ids[keep])
+        return FrameResult(
+            boxes=boxes[keep],
+            class_ids=class_ids[keep],
+            class_names=self.table.names[class_ids[keep]],
+            confidences=scores[keep],
+            categories=categories,
+            counts=counts,
+        )
+
+
+def main(argv=None):
+    from scheduler import get_scheduler
+
+    parser = argparse.ArgumentParser(description="Compare whole-image and tiled detection on large images.")
+    parser.add_argument("images", nargs="+")
+    parser.add_argument("--tile", type=int, default=TILE_SIZE)
+    parser.add_argument("--overlap", type=float, default=TILE_OVERLAP)
+    args = parser.parse_args(argv)
+
+    engine = get_scheduler()
+    tiled = TiledDetector(engine, tile=args.tile, overlap=args.overlap)
+    for path in args.images:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        row = {"image": path, "size": list(image.shape[1::-1])}
+        for name, detector in (("whole", engine), ("tiled", tiled)):
+            start = time.perf_counter()
+            result = detector.detect(image)
+            row[name] = {"detections": len(result.class_ids), "ms": (time.perf_counter() - start) * 1000}
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import numpy as np
+
+import settings
+from detector import CATEGORIES, CategoryTable, FrameResult
+
+IOU_THRESHOLD = getattr(settings, "TRACK_IOU_THRESHOLD", 0.3)
+MAX_MISSES = getattr(settings, "TRACK_MAX_MISSES", 3)
+MIN_HITS = getattr(settings, "TRACK_MIN_HITS", 2)
+# How far, in box sizes per frame, an unproven or long-unseen track may have moved
+MAX_SHIFT = getattr(settings, "TRACK_MAX_SHIFT", 0.25)
+
+
+def iou_matrix(a, b):
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+def centre_distance(a, b):
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    ca = (a[:, :2] + a[:, 2:]) / 2
+    cb = (b[:, :2] + b[:, 2:]) / 2
+    return np.linalg.norm(ca[:, None, :] - cb[None, :, :], axis=2)
+
+
+def greedy_match(scores, threshold):
+    # Highest-scoring pairs first; each row and column is used at most once
+    rows, cols = np.nonzero(scores >= threshold)
+    order = np.argsort(-scores[rows, cols], kind="stable")
+    used_rows, used_cols, pairs = set(), set(), []
+    for r, c in zip(rows[order].tolist(), cols[order].tolist()):
+        if r not in used_rows and c not in used_cols:
+            used_rows.add(r)
+            used_cols.add(c)
+            pairs.append((r, c))
+    return pairs
+
+
+class Tracker:
+    # IoU tracker with a constant-velocity motion model. Every detection frame matches boxes
+    # of the same class to predicted track positions; frames the detector skipped only move
+    # tracks along their velocity, which is how a detector run every k frames is bridged.
+
+    def __init__(self, names, iou_threshold=IOU_THRESHOLD, max_misses=MAX_MISSES, min_hits=MIN_HITS,
+                 max_shift=MAX_SHIFT, smoothing=0.5):
+        self.table = CategoryTable(names)
+        self.iou_threshold = iou_threshold
+        self.max_shift = max_shift
+        self.max_misses = max_misses
+        self.min_hits = min_hits
+        self.smoothing = smoothing
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.velocity = np.zeros((0, 4), dtype=np.float32)
+        self.class_ids = np.zeros(0, dtype=np.intp)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.hits = np.zeros(0, dtype=np.int32)
+        self.misses = np.zeros(0, dtype=np.int32)
+        self.since_update = np.zeros(0, dtype=np.int32)
+        self.counted = {}
+        self._next_id = 1
+        self._last_input = None
+
+    def _predict(self):
+        self.boxes = self.boxes + self.velocity
+        self.since_update = self.since_update + 1
+
+    def _update(self, result):
+        det_boxes = np.asarray(result.boxes, dtype=np.float32).reshape(-1, 4)
+        det_classes = np.asarray(result.class_ids, dtype=np.intp)
+        scores = iou_matrix(self.boxes, det_boxes)
+        scores[self.class_ids[:, None] != det_classes[None, :]] = 0
+        pairs = greedy_match(scores, self.iou_threshold)
+        pairs += self._match_by_distance(det_boxes, det_classes, pairs)
+
+        matched_tracks = np.array([t for t, _ in pairs], dtype=np.intp)
+        matched_dets = np.array([d for _, d in pairs], dtype=np.intp)
+        if len(pairs):
+            # The box moved this far since the last matched detection, spread over the frames between
+            steps = np.maximum(self.since_update[matched_tracks], 1)[:, None]
+            previous = self.boxes[matched_tracks] - self.velocity[matched_tracks] * steps
+            observed = (det_boxes[matched_dets] - previous) / steps
+            # A track's first match is its first velocity estimate, so it is taken as is
+            weight = np.where(self.hits[matched_tracks] == 1, 1.0, self.smoothing)[:, None]
+            self.velocity[matched_tracks] = weight * observed + (1 - weight) * self.velocity[matched_tracks]
+            self.boxes[matched_tracks] = det_boxes[matched_dets]
+            self.hits[matched_tracks] += 1
+            self.misses[matched_tracks] = 0
+            self.since_update[matched_tracks] = 0
+
+        unmatched = np.ones(len(self.ids), dtype=bool)
+        unmatched[matched_tracks] = False
+        self.misses[unmatched] += 1
+
+        new = np.ones(len(det_boxes), dtype=bool)
+        new[matched_dets] = False
+        count = int(new.sum())
+        if count:
+            self.boxes = np.vstack([self.boxes, det_boxes[new]])
+            self.velocity = np.vstack([self.velocity, np.zeros((count, 4), dtype=np.float32)])
+            self.class_ids = np.concatenate([self.class_ids, det_classes[new]])
+            self.ids = np.concatenate([self.ids, np.arange(self._next_id, self._next_id + count)])
+            self.hits = np.concatenate([self.hits, np.ones(count, dtype=np.int32)])
+            self.misses = np.concatenate([self.misses, np.zeros(count, dtype=np.int32)])
+            self.since_update = np.concatenate([self.since_update, np.zeros(count, dtype=np.int32)])
+            self._next_id += count
+
+        keep = self.misses <= self.max_misses
+        for name in ("boxes", "velocity", "class_ids", "ids", "hits", "misses", "since_update"):
+            setattr(self, name, getattr(self, name)[keep])
+
+        confirmed = self.hits >= self.min_hits
+        for track_id, class_id in zip(self.ids[confirmed].tolist(), self.class_ids[confirmed].tolist()):
+            self.counted.setdefault(track_id, class_id)
+
+    def _match_by_distance(self, det_boxes, det_classes, pairs):
+        # New tracks have no velocity yet and long-unseen ones may have drifted from their
+        # prediction, so with the detector run every few frames their boxes no longer overlap
+        # the detection. These fall back to matching centres within a radius that grows with
+        # the box size and the number of frames since the last detection.
+        used_tracks = {t for t, _ in pairs}
+        used_dets = {d for _, d in pairs}
+        tracks = [t for t in range(len(self.ids)) if t not in used_tracks
+                  and (self.since_update[t] > 1 or self.hits[t] < self.min_hits)]
+        dets = [d for d in range(len(det_boxes)) if d not in used_dets]
+        if not tracks or not dets:
+            return []
+        tracks = np.array(tracks, dtype=np.intp)
+        dets = np.array(dets, dtype=np.intp)
+        sizes = np.max(self.boxes[tracks, 2:] - self.boxes[tracks, :2], axis=1)
+        radius = self.max_shift * sizes * np.maximum(self.since_update[tracks], 1)
+        scores = 1 - centre_distance(self.boxes[tracks], det_boxes[dets]) / np.maximum(radius, 1e-6)[:, None]
+        scores[self.class_ids[tracks][:, None] != det_classes[dets][None, :]] = -1
+        return [(int(tracks[t]), int(dets[d])) for t, d in greedy_match(scores, 0)]
+
+    def step(self, result):
+        # A result repeated from the previous frame (a sampler skipped this one) only advances motion
+        self._predict()
+        if result is not self._last_input:
+            self._update(result)
+        self._last_input = result
+
+        # Confirmed tracks still matched at the last detection frame, at their predicted position
+        visible = (self.hits >= self.min_hits) & (self.misses == 0)
+        class_ids = self.class_ids[visible]
+        categories, counts = self.table.classify(class_ids)
+        return FrameResult(
+            boxes=self.boxes[visible].copy(),
+            class_ids=class_ids,
+            class_names=self.table.names[class_ids],
+            confidences=np.ones(len(class_ids), dtype=np.float32),
+            categories=categories,
+            counts=counts,
+            track_ids=self.ids[visible].copy(),
+        )
+
+    def unique_counts(self):
+        # Distinct confirmed items seen so far, per waste category and per class name
+        class_ids = np.array(list(self.counted.values()), dtype=np.intp)
+        _, by_category = self.table.classify(class_ids)
+        names, counts = np.unique(self.table.names[class_ids].astype(str), return_counts=True)
+        return by_category, dict(zip(names.tolist(), counts.tolist()))
+
+
+def format_unique_counts(by_category, by_class):
+    lines = [f"{category.replace('_', ' ').title()}: {by_category[category]}" for category in CATEGORIES
+             if by_category.get(category)]
+    lines += [f"{name.replace('_', ' ').title()}: {count}" for name, count in sorted(by_class.items())]
+    return lines
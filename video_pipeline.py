@@ -0,0 +1,230 @@
+import os
+import queue
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import cv2
+
+from preprocessing import FRAME_SIZE, Preprocessor
+from sampling import EveryFrameSampler
+
+QUEUE_SIZE = 8
+CHUNK_SIZE = 1024 * 1024
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+def _put(q, item, stop):
+    # Blocks while the downstream stage is behind, but gives up once stopped
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def decode_frames(video_path, size=FRAME_SIZE, start=0, preprocess=None):
+    preprocess = preprocess or (Preprocessor(size) if size else None)
+    cap = cv2.VideoCapture(video_path)
+    if start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    try:
+        while cap.isOpened():
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield preprocess(frame) if preprocess else frame
+    finally:
+        cap.release()
+
+
+@contextmanager
+def spooled_upload(uploaded_file, chunk_size=CHUNK_SIZE):
+    # Copies the upload to disk in fixed-size chunks and always removes the file afterwards.
+    # The original suffix is kept because OpenCV picks the demuxer from it.
+    suffix = os.path.splitext(getattr(uploaded_file, "name", ""))[1]
+    fd, path = tempfile.mkstemp(prefix="ecodetect-", suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if hasattr(uploaded_file, "seek"):
+                uploaded_file.seek(0)
+            shutil.copyfileobj(uploaded_file, f, chunk_size)
+        yield path
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def open_writer(path, fps, size=FRAME_SIZE):
+    # H.264 plays in browsers but needs an OpenCV build with an encoder for it; mp4v always works
+    for codec in ("avc1", "mp4v"):
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, size)
+        if writer.isOpened():
+            return writer
+        writer.release()
+    raise RuntimeError(f"Could not open a video encoder for {path}")
+
+
+class AnnotatedVideoWriter:
+    # Encoder stage: annotation and encoding run on their own thread behind a bounded queue,
+    # so writing every frame does not slow down the thread that renders previews.
+
+    def __init__(self, path, fps, size=FRAME_SIZE, queue_size=QUEUE_SIZE, annotate=None):
+        self.path = path
+        self.size = size
+        self.annotate = annotate or (lambda frame, result: result.plot(frame))
+        self.written = 0
+        self._writer = open_writer(path, fps if fps and fps > 0 else 30.0, size)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="video-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                return
+            if self._error is not None:
+                continue
+            frame, result = item
+            try:
+                annotated = self.annotate(frame, result) if result is not None else frame
+                if annotated.shape[1::-1] != self.size:
+                    annotated = cv2.resize(annotated, self.size)
+                self._writer.write(annotated)
+                self.written += 1
+            except Exception as e:
+                self._error = e
+
+    def write(self, frame, result=None):
+        self._queue.put((frame, result))
+
+    def close(self):
+        self._queue.put(_DONE)
+        self._thread.join()
+        self._writer.release()
+        if self._error is not None:
+            raise self._error
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def video_info(video_path):
+    cap = cv2.VideoCapture(video_path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return total, fps
+
+
+class VideoPipeline:
+    def __init__(self, engine, queue_size=QUEUE_SIZE, batch_size=None, size=FRAME_SIZE, sampler=None):
+        self.engine = engine
+        self.sampler = sampler or EveryFrameSampler()
+        self.stats = {"frames": 0, "inferred": 0}
+        self.queue_size = queue_size
+        self.batch_size = batch_size or engine.batch_size
+        self.size = size
+
+    def _decode(self, frames, decoded, stop, start):
+        try:
+            for index, frame in enumerate(frames, start):
+                # The first frame always goes to the model so there is something to carry forward
+                infer = index == start or self.sampler.should_infer(index, frame)
+                if not _put(decoded, (index, frame, infer), stop):
+                    return
+            _put(decoded, _DONE, stop)
+        except Exception as e:
+            _put(decoded, _Failure(e), stop)
+        finally:
+            close = getattr(frames, "close", None)
+            if close:
+                close()
+
+    def _infer(self, decoded, inferred, stop):
+        try:
+            last_result = None
+            done = False
+            while not done and not stop.is_set():
+                # Take whatever is already decoded, up to one batch, without waiting for a full batch
+                batch = []
+                pending = 0
+                item = _get(decoded, stop)
+                while True:
+                    if item is _DONE or isinstance(item, _Failure):
+                        done = True
+                        break
+                    batch.append(item)
+                    pending += item[2]
+                    if pending >= self.batch_size:
+                        break
+                    try:
+                        item = decoded.get_nowait()
+                    except queue.Empty:
+                        break
+                if batch:
+                    results = iter(self.engine.predict([frame for _, frame, infer in batch if infer]))
+                    self.stats["inferred"] += pending
+                    for index, frame, infer in batch:
+                        # Skipped frames reuse the detections of the last analysed frame
+                        if infer:
+                            last_result = next(results)
+                        self.stats["frames"] += 1
+                        if not _put(inferred, (index, frame, last_result), stop):
+                            return
+                if done:
+                    _put(inferred, item, stop)
+        except Exception as e:
+            _put(inferred, _Failure(e), stop)
+
+    def run(self, source, start=0):
+        # Yields (index, frame, result) in order; annotation and display stay on the caller's thread.
+        # start skips ahead in a video file (or numbers an iterator's frames from that index).
+        frames = decode_frames(source, self.size, start) if isinstance(source, str) else source
+        decoded = queue.Queue(maxsize=self.queue_size)
+        inferred = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        workers = [
+            threading.Thread(target=self._decode, args=(frames, decoded, stop, start), daemon=True),
+            threading.Thread(target=self._infer, args=(decoded, inferred, stop), daemon=True),
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            while True:
+                item = _get(inferred, stop)
+                if item is _DONE:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            stop.set()
+            for worker in workers:
+                worker.join()